@@ -0,0 +1,70 @@
+""" Benchmark affiliation NER tiers (spacy, rules, tiered): throughput and agreement with the spaCy output
+
+Usage: python benchmarks/bench_affiliation_ner.py [-c CONFIG_FILE] [-d NXML_DIR] [-m FALLBACK_SPACY_MODEL]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import spacy
+from bs4 import BeautifulSoup
+
+from corpusbuilder.affiliation_resolver import AffiliationResolver
+from corpusbuilder.config import Config
+from corpusbuilder.corpus_builder import CorpusBuilder
+from corpusbuilder.helper import get_file_paths
+
+
+def load_affiliations(nxml_dir):
+    """Return all aff tags found in the nxml files of a directory"""
+    affs = []
+    for nxml_file in get_file_paths(["nxml"], nxml_dir):
+        with open(nxml_file, encoding='utf-8') as xml_file:
+            affs.extend(BeautifulSoup(xml_file.read(), 'html.parser').find_all('aff'))
+    return affs
+
+
+def run_tier(affs, nlp, repeat):
+    """Return (results, affiliations per second) for running get_affiliation over all affs"""
+    results = [CorpusBuilder.get_affiliation(aff, nlp) for aff in affs]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for aff in affs:
+            CorpusBuilder.get_affiliation(aff, nlp)
+    elapsed = time.perf_counter() - start
+    return results, (len(affs) * repeat) / elapsed if elapsed > 0 else 0.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark affiliation NER tiers")
+    parser.add_argument("-c", "--config", default="config.ini", help="Path to config file")
+    parser.add_argument("-d", "--dir", default="tests", help="Directory containing nxml files")
+    parser.add_argument("-m", "--fallback-model", default="", help="spaCy model for the tiered fallback (default: SpacyModel)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Number of timed passes")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    affs = load_affiliations(args.dir)
+    print("Affiliations: " + str(len(affs)))
+
+    reference_nlp = spacy.load(config.spacy_model)
+    fallback_nlp = spacy.load(args.fallback_model) if args.fallback_model else reference_nlp
+    tiers = {
+        "spacy (" + config.spacy_model + ")": reference_nlp,
+        "rules": AffiliationResolver(mode="rules"),
+        "tiered": AffiliationResolver(fallback_nlp, "tiered", config.affiliation_ner_min_confidence),
+    }
+
+    reference = None
+    print("{0:<30} {1:>12} {2:>12} {3:>12}".format("tier", "affs/sec", "agreement", "spacy calls"))
+    for name, nlp in tiers.items():
+        results, throughput = run_tier(affs, nlp, args.repeat)
+        if reference is None:
+            reference = results
+        agreement = sum(1 for a, b in zip(results, reference) if a == b) / len(affs) if affs else 1.0
+        spacy_calls = nlp.stats["spacy"] if isinstance(nlp, AffiliationResolver) else "-"
+        print("{0:<30} {1:>12.1f} {2:>11.1%} {3:>12}".format(name, throughput, agreement, spacy_calls))
@@ -0,0 +1,53 @@
+""" Benchmark getting affiliation text without excluded tags: copy and decompose vs a single walk of the aff node
+
+Usage: python benchmarks/bench_affiliation_text.py [-d NXML_DIR] [-r REPEAT]
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bs4 import BeautifulSoup
+
+from corpusbuilder.corpus_builder import CorpusBuilder
+from corpusbuilder.helper import get_file_paths, get_text_excluding_tags
+
+EXCLUDED_TAGS = ['institution-wrap', 'institution', 'label', 'sup', 'email', 'named-content']
+
+
+def copy_and_decompose(aff):
+    """Previous implementation: copy the aff subtree and decompose the excluded tags"""
+    temp = copy.copy(aff)
+    for label in EXCLUDED_TAGS:
+        CorpusBuilder.decompose_tag(temp, label)
+    return temp.get_text()
+
+
+def walk(aff):
+    return get_text_excluding_tags(aff, EXCLUDED_TAGS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark affiliation text extraction")
+    parser.add_argument("-d", "--dir", default="tests", help="Directory containing nxml files")
+    parser.add_argument("-r", "--repeat", type=int, default=200, help="Number of timed passes")
+    args = parser.parse_args()
+
+    affs = []
+    for nxml_file in get_file_paths(["nxml"], args.dir):
+        with open(nxml_file, encoding='utf-8') as xml_file:
+            affs.extend(BeautifulSoup(xml_file.read(), 'html.parser').find_all('aff'))
+
+    print("Affiliations: " + str(len(affs)))
+    assert [copy_and_decompose(aff) for aff in affs] == [walk(aff) for aff in affs]
+    for name, func in [("copy and decompose", copy_and_decompose), ("walk", walk)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for aff in affs:
+                func(aff)
+        elapsed = time.perf_counter() - start
+        print("{0:<20} {1:>10.1f} us/aff".format(name, elapsed / (args.repeat * max(len(affs), 1)) * 1e6))
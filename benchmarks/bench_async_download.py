@@ -0,0 +1,100 @@
+""" Benchmark the asyncio download engine against the pycurl one, using a local aiohttp server standing in for the PMC server
+
+The server serves small article archives under pub/pmc/ and adds a fixed latency to each response, to mimic a remote server.
+
+Usage: python benchmarks/bench_async_download.py [-n NUM_ARCHIVES] [-l LATENCY_MS] [-m MAX_CONCURRENT_DOWNLOADS]
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from aiohttp import web
+
+from corpusbuilder.async_download import AsyncDownload
+from corpusbuilder.config import Config
+from corpusbuilder.ftp_download import FTPDownload
+from corpusbuilder.helper import extract_tar_file
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def make_archive(pmc_id):
+    """Return bytes of a tar.gz article archive containing the test article PMC7826947"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        archive.add(os.path.join(ROOT_DIR, "tests/corpus-download/PMC7826947/vaccines-09-00030.nxml"),
+                    arcname=pmc_id + "/vaccines-09-00030.nxml")
+    return buffer.getvalue()
+
+
+def start_server(archives, latency, port_holder, started):
+    """Run the stand-in server in its own thread and event loop"""
+    async def handle(request):
+        await asyncio.sleep(latency)
+        return web.Response(body=archives[request.match_info["path"].split("/")[-1]])
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/pub/pmc/{path:.*}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port_holder.append(site._server.sockets[0].getsockname()[1])
+        started.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark asyncio vs pycurl download engines")
+    parser.add_argument("-n", "--num-archives", type=int, default=200, help="Number of archives to download")
+    parser.add_argument("-l", "--latency-ms", type=float, default=50, help="Latency added by the server to each response")
+    parser.add_argument("-m", "--max-concurrent-downloads", type=int, default=64, help="Transfers in flight for asyncio")
+    args = parser.parse_args()
+
+    archives = {"PMC" + str(i) + ".tar.gz": make_archive("PMC" + str(i)) for i in range(args.num_archives)}
+    metadata_list = [{'result': True, 'ftp_file_path': "oa_package/", 'file_name': file_name, 'pmc_id': file_name[:-7],
+                      'pmc_license': 'CC BY', 'last_updated': ""} for file_name in archives]
+
+    port_holder = []
+    started = threading.Event()
+    threading.Thread(target=start_server, args=(archives, args.latency_ms / 1000, port_holder, started), daemon=True).start()
+    started.wait()
+    server_url = "http://127.0.0.1:" + str(port_holder[0])
+
+    config = Config(os.path.join(ROOT_DIR, "config.ini"))
+    config.pubmed_ftp_server = server_url
+    config.pubmed_https_url = server_url
+    config.max_concurrent_downloads = args.max_concurrent_downloads
+
+    with tempfile.TemporaryDirectory() as download_dir:
+        config.corpus_download_dir = download_dir + "/pycurl/"
+        start = time.perf_counter()
+        ftp_download = FTPDownload(config)
+        for metadata in metadata_list:
+            ftp_download.download_ftp_file(config.pubmed_ftp_path + metadata['ftp_file_path'], metadata['file_name'])
+            extract_tar_file(config.corpus_download_dir, config.corpus_download_dir + metadata['file_name'])
+        pycurl_time = time.perf_counter() - start
+        assert len(os.listdir(config.corpus_download_dir)) == len(metadata_list)
+
+        config.corpus_download_dir = download_dir + "/asyncio/"
+        start = time.perf_counter()
+        num_retrieved = AsyncDownload(config).download_and_extract_all(metadata_list)
+        asyncio_time = time.perf_counter() - start
+        assert num_retrieved == len(metadata_list)
+        assert len(os.listdir(config.corpus_download_dir)) == len(metadata_list)
+
+    print("Archives: {0}, server latency: {1} ms".format(args.num_archives, args.latency_ms))
+    print("{0:<10} {1:>10.2f} s".format("pycurl", pycurl_time))
+    print("{0:<10} {1:>10.2f} s ({2:.1f}x)".format("asyncio", asyncio_time, pycurl_time / asyncio_time))
@@ -0,0 +1,68 @@
+""" Benchmark the CorpusBuilder metadata getters on the soup vs on a JatsLookup of the same document
+
+Usage: python benchmarks/bench_getters.py [-d NXML_DIR] [-r REPEAT]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bs4 import BeautifulSoup
+
+from corpusbuilder.affiliation_resolver import AffiliationResolver
+from corpusbuilder.corpus_builder import CorpusBuilder
+from corpusbuilder.helper import get_file_paths, replace_encodings
+from corpusbuilder.jats_lookup import JatsLookup
+
+NLP = AffiliationResolver(mode="rules")
+AFFILIATIONS = {}   # affiliations of each soup/lookup, so get_authors is timed on its own
+
+GETTERS = {
+    "get_article_title": lambda doc: CorpusBuilder.get_article_title(doc),
+    "get_publisher": lambda doc: CorpusBuilder.get_publisher(doc),
+    "get_journal": lambda doc: CorpusBuilder.get_journal(doc),
+    "get_all_affiliations": lambda doc: CorpusBuilder.get_all_affiliations(NLP, doc),
+    "get_authors": lambda doc: CorpusBuilder.get_authors(AFFILIATIONS[id(doc)], doc),
+    "get_publication_date": lambda doc: CorpusBuilder.get_publication_date(doc),
+    "get_funding_group": lambda doc: CorpusBuilder.get_funding_group(doc),
+    "get_figures": lambda doc: CorpusBuilder.get_figures(doc, []),
+    "find_all table-wrap": lambda doc: doc.find_all('table-wrap'),
+}
+
+
+def time_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark metadata getters")
+    parser.add_argument("-d", "--dir", default="tests", help="Directory containing nxml files")
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="Number of timed passes")
+    args = parser.parse_args()
+
+    soups = []
+    for nxml_file in get_file_paths(["nxml"], args.dir):
+        with open(nxml_file, encoding='utf-8') as xml_file:
+            soups.append(BeautifulSoup(replace_encodings(xml_file.read()), 'html.parser'))
+    lookups = [JatsLookup(soup) for soup in soups]
+    for doc in soups + lookups:
+        AFFILIATIONS[id(doc)] = {aff_id: {} for aff_id in CorpusBuilder.get_all_affiliations(NLP, doc)}
+
+    print("Documents: " + str(len(soups)))
+    print("{0:<25} {1:>12} {2:>12}".format("getter", "soup us", "lookup us"))
+    print("{0:<25} {1:>12} {2:>12.1f}".format("JatsLookup(soup)", "-",
+                                              sum(time_call(lambda: JatsLookup(soup), args.repeat) for soup in soups) * 1e6))
+    total_soup = total_lookup = 0.0
+    for name, getter in GETTERS.items():
+        soup_time = sum(time_call(lambda: getter(soup), args.repeat) for soup in soups)
+        lookup_time = sum(time_call(lambda: getter(lookup), args.repeat) for lookup in lookups)
+        total_soup += soup_time
+        total_lookup += lookup_time
+        print("{0:<25} {1:>12.1f} {2:>12.1f}".format(name, soup_time * 1e6, lookup_time * 1e6))
+    print("{0:<25} {1:>12.1f} {2:>12.1f}".format("total", total_soup * 1e6, total_lookup * 1e6))
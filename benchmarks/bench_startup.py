@@ -0,0 +1,43 @@
+""" Benchmark start-up (import) time of the corpusbuilder modules used by the command line scripts
+
+Usage: python benchmarks/bench_startup.py [-n RUNS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+IMPORTS = {
+    "corpusbuilder.corpus_builder": "import corpusbuilder.corpus_builder",
+    "download_corpus imports": "from corpusbuilder.corpus_builder import CorpusBuilder; from corpusbuilder.command_line import CommandLineForDownload",
+    "extract_corpus imports": "from corpusbuilder.corpus_builder import CorpusBuilder; from corpusbuilder.document_index import DocumentIndex; from corpusbuilder.helper import *",
+    "spacy (reference)": "import spacy",
+}
+
+
+def time_import(statement, runs):
+    """Return wall-clock times (secs) of a fresh interpreter running the import statement"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=ROOT_DIR, check=False,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark corpusbuilder import time")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="Number of runs per import")
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import("pass", args.runs))
+    print("{0:<30} {1:>10}".format("import", "median ms"))
+    print("{0:<30} {1:>10.1f}".format("(empty interpreter)", baseline * 1000))
+    for name, statement in IMPORTS.items():
+        print("{0:<30} {1:>10.1f}".format(name, statistics.median(time_import(statement, args.runs)) * 1000))
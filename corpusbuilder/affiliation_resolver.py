@@ -0,0 +1,112 @@
+"""
+A module for splitting unstructured affiliation strings into institution name and location
+"""
+
+import logging
+import re
+
+# words that mark a comma-separated segment as part of the institution name
+INSTITUTION_KEYWORDS = ["university", "univ", "universidad", "universidade", "université", "universität", "universita",
+                        "college", "school", "faculty", "department", "dept", "division", "institute", "institut",
+                        "instituto", "istituto", "hospital", "clinic", "center", "centre", "laboratory", "laboratories",
+                        "lab", "academy", "foundation", "unit", "program", "programme", "council", "agency",
+                        "ministry", "service", "society", "group", "company", "corporation", "corp", "inc", "ltd",
+                        "llc", "gmbh", "plc"]
+
+INSTITUTION_KEYWORD_REGEX = re.compile(r"\b(" + "|".join(INSTITUTION_KEYWORDS) + r")\b", re.IGNORECASE)
+
+# rule-based results are rated with one of these confidence values
+CONFIDENCE_HIGH = 1.0      # institution segment(s) followed by location segment(s)
+CONFIDENCE_LOW = 0.5       # institution segment(s) but no location left over
+CONFIDENCE_NONE = 0.0      # no institution keyword found
+
+AFFILIATION_NER_MODES = ["spacy", "rules", "tiered"]
+
+
+def spacy_name_location(nlp, sentence):
+    """Returns name and location in a dict, given spacy module and affiliation sentence"""
+    dic = {"name": "",
+           "location": ""
+           }
+    sentence_tuple = nlp(sentence).ents
+    entity = ""
+    remaining_sentence = ""
+    for i in range(len(sentence_tuple)):
+        ent = sentence_tuple[i]
+        if ent.label_ == 'ORG':
+            entity = ent.text
+        else:
+            if dic['name'] == "" and entity != "":
+                name = sentence[:sentence.find(entity) + len(entity)]
+                remaining_sentence = sentence[len(name) + 1:].strip()
+                dic['name'] = name.strip()
+                entity = ""
+            entity = ent.text
+    if dic['name'] != "":
+        location = remaining_sentence[:remaining_sentence.find(entity) + len(entity)]
+        dic['location'] = location
+    else:
+        name = sentence[:sentence.find(entity) + len(entity)]
+        dic['name'] = name.strip()
+
+    return dic
+
+
+def rule_name_location(sentence):
+    """
+    Returns name and location in a dict plus a confidence value, given affiliation sentence (with country removed)
+
+    The sentence is cut at the first ';' (which usually starts email/phone details) and split on commas.
+    Everything up to the last segment containing an institution keyword is the name, the rest is the location.
+    """
+    dic = {"name": "",
+           "location": ""
+           }
+    segments = [segment.strip() for segment in sentence.split(";")[0].split(",")]
+    segments = [segment for segment in segments if segment != ""]
+
+    last_name_segment = -1
+    for i, segment in enumerate(segments):
+        if INSTITUTION_KEYWORD_REGEX.search(segment) is not None:
+            last_name_segment = i
+
+    if last_name_segment == -1:
+        return dic, CONFIDENCE_NONE
+
+    dic["name"] = ", ".join(segments[:last_name_segment + 1])
+    dic["location"] = ", ".join(segments[last_name_segment + 1:])
+    if dic["location"] == "":
+        return dic, CONFIDENCE_LOW
+    return dic, CONFIDENCE_HIGH
+
+
+class AffiliationResolver(object):
+    """
+    Resolves name and location of unstructured affiliations, using rules, spaCy NER, or rules with spaCy as fallback
+
+    Can be passed wherever CorpusBuilder expects the spaCy module (nlp).
+    """
+
+    def __init__(self, nlp=None, mode="tiered", min_confidence=CONFIDENCE_HIGH):
+        if mode not in AFFILIATION_NER_MODES:
+            raise ValueError("Unknown affiliation NER mode: " + str(mode))
+        if mode != "rules" and nlp is None:
+            raise ValueError("A spaCy model is required for affiliation NER mode: " + mode)
+        self.nlp = nlp
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.stats = {"rules": 0, "spacy": 0}
+
+    def get_name_location(self, sentence):
+        """Returns name and location in a dict, given affiliation sentence"""
+        if self.mode != "spacy":
+            dic, confidence = rule_name_location(sentence)
+            if self.mode == "rules" or confidence >= self.min_confidence:
+                self.stats["rules"] += 1
+                return dic
+        self.stats["spacy"] += 1
+        return spacy_name_location(self.nlp, sentence)
+
+    def log_stats(self):
+        """Log how many affiliations were resolved by each tier"""
+        logging.info('Affiliations resolved by rules: ' + str(self.stats["rules"]) + ', by spaCy: ' + str(self.stats["spacy"]))
@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import os
+from corpusbuilder.helper import PARTIAL_FILE_SUFFIX, create_dir, get_tar_file_error, hash_file, link_or_copy
+
+ARCHIVE_SUFFIX = ".tar.gz"
+CHECKSUM_SUFFIX = ".sha256"     # next to each cached archive: its sha256 and size, recorded when it was stored
+
+
+class ArchiveCache(object):
+    """
+    A local cache of PMC article archives shared across runs and search terms, with a size cap and LRU eviction
+
+    Archives are verified in full when downloaded, so on a cache hit only their size and sha256 are checked against
+    those recorded when they were stored.
+    """
+
+    def __init__(self, cache_dir, max_bytes=0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes      # 0 means no size cap
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = None         # running size of the cache, measured on the first store (when there is a cap)
+        create_dir(self.cache_dir)
+
+    @staticmethod
+    def get_key(ftp_file_path, file_name, last_updated):
+        """Return cache key for an archive, given its path and file name on the PMC server and its last-updated date in the index"""
+        return hashlib.sha256((ftp_file_path + file_name + "|" + str(last_updated)).encode('utf-8')).hexdigest()
+
+    def get_cache_path(self, key):
+        """Return path of a cached archive, given its cache key"""
+        return os.path.join(self.cache_dir, key[:2], key + ARCHIVE_SUFFIX)
+
+    @staticmethod
+    def get_checksum_path(cache_path):
+        """Return path of the file holding the sha256 and size of a cached archive, given the archive's path"""
+        return cache_path[:-len(ARCHIVE_SUFFIX)] + CHECKSUM_SUFFIX
+
+    def get_size(self, key):
+        """Return size in bytes of a cached archive, or None if it is not cached"""
+        cache_path = self.get_cache_path(key)
+        return os.path.getsize(cache_path) if os.path.exists(cache_path) else None
+
+    def fetch(self, key, output_file):
+        """
+        Put the cached archive at output_file and return true, or return false if it is not cached
+        A cached archive whose size or sha256 changed (e.g. damaged on disk) is removed and counted as a miss, as is one
+        that another run sharing the cache evicts while it is being fetched
+        """
+        cache_path = self.get_cache_path(key)
+        if not os.path.exists(cache_path):
+            self.misses += 1
+            return False
+        try:
+            error = self.__get_error(cache_path)
+            if error != "":
+                logging.warning('Removing corrupt archive ' + cache_path + ' from the archive cache: ' + error)
+                self.remove(key)
+                self.misses += 1
+                return False
+            os.utime(cache_path)    # mark as recently used
+            link_or_copy(cache_path, output_file)
+        except OSError:
+            logging.exception('Could not fetch ' + cache_path + ' from the archive cache')
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def __get_error(self, cache_path):
+        """Return why a cached archive does not match the size and sha256 recorded for it, or "" if it does"""
+        checksum_path = self.get_checksum_path(cache_path)
+        if not os.path.exists(checksum_path):
+            # stored before checksums were recorded: verify the archive in full once, then record them
+            error = get_tar_file_error(cache_path)
+            if error == "":
+                self.__write_checksum(cache_path)
+            return error
+        try:
+            with open(checksum_path, 'r') as file:
+                sha256, size = file.read().split()
+            size = int(size)
+        except ValueError:
+            return "unreadable " + checksum_path
+        if os.path.getsize(cache_path) != size:
+            return "size is " + str(os.path.getsize(cache_path)) + " bytes, stored " + str(size)
+        if hash_file(cache_path) != sha256:
+            return "sha256 does not match"
+        return ""
+
+    def __write_checksum(self, cache_path):
+        checksum_path = self.get_checksum_path(cache_path)
+        with open(checksum_path + PARTIAL_FILE_SUFFIX, 'w') as file:
+            file.write(hash_file(cache_path) + " " + str(os.path.getsize(cache_path)) + "\n")
+        os.replace(checksum_path + PARTIAL_FILE_SUFFIX, checksum_path)
+
+    def store(self, key, file):
+        """Add a downloaded archive to the cache, then evict least recently used archives beyond the size cap"""
+        if not os.path.exists(file) or os.path.getsize(file) == 0:
+            return
+        cache_path = self.get_cache_path(key)
+        if self.max_bytes > 0 and self.total_bytes is None:
+            self.total_bytes = sum(entry[1] for entry in self.__get_entries())
+        old_size = os.path.getsize(cache_path) if os.path.exists(cache_path) else 0
+        create_dir(os.path.dirname(cache_path))
+        link_or_copy(file, cache_path)
+        self.__write_checksum(cache_path)
+        if self.total_bytes is not None:
+            self.total_bytes += os.path.getsize(cache_path) - old_size
+        self.evict()
+
+    def remove(self, key):
+        """Remove an archive from the cache, if it is cached"""
+        cache_path = self.get_cache_path(key)
+        if not os.path.exists(cache_path):
+            return
+        size = os.path.getsize(cache_path)
+        self.__remove_entry(cache_path)
+        if self.total_bytes is not None:
+            self.total_bytes -= size
+
+    def __remove_entry(self, cache_path):
+        """Remove a cached archive and its checksum (either may already have been removed by another run)"""
+        for path in [cache_path, self.get_checksum_path(cache_path)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def __get_entries(self):
+        """Return list of (last used, size, path) of the archives in the cache"""
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for file in files:
+                # checksums, and .part files of archives being stored by another run sharing the cache, are left alone
+                if not file.endswith(ARCHIVE_SUFFIX):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:   # evicted by another run
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used archives until the cache is within its size cap (only scans the cache when over the cap)"""
+        if self.max_bytes <= 0 or (self.total_bytes is not None and self.total_bytes <= self.max_bytes):
+            return
+        entries = self.__get_entries()
+        total_bytes = sum(entry[1] for entry in entries)
+        for mtime, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self.__remove_entry(path)
+            total_bytes -= size
+        # other runs sharing the cache may have added or evicted archives, so the scan also resets the running total
+        self.total_bytes = total_bytes
+
+    def get_hit_rate(self):
+        """Return fraction of lookups that were served from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def log_stats(self):
+        """Log cache hits, misses and hit rate"""
+        logging.info('Archive cache ' + self.cache_dir + ': ' + str(self.hits) + ' hits, ' + str(self.misses) +
+                     ' misses, hit rate ' + '{0:.1%}'.format(self.get_hit_rate()))
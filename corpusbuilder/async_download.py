@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from corpusbuilder.archive_cache import ArchiveCache
+from corpusbuilder.helper import *
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AsyncDownload(object):
+    """Downloads PMC article archives over HTTPS with asyncio, with a bounded number of transfers in flight (alternative to FTPDownload)"""
+
+    def __init__(self, config, archive_cache=None, image_store=None, disk_governor=None):
+        self.config = config
+        self.archive_cache = archive_cache
+        self.image_store = image_store
+        self.disk_governor = disk_governor
+        self.num_failed = 0
+
+    def get_url(self, path, file_name):
+        """Return HTTPS URL of a file, given its path and name on the PMC server"""
+        parts = [self.config.pubmed_https_url, path, file_name]
+        return "/".join(part.strip("/") for part in parts if part.strip("/") != "")
+
+    def download_and_extract_all(self, metadata_list):
+        """Download and unpack the archives of the given articles (as returned by DocumentIndex), return number of articles retrieved"""
+        return asyncio.run(self.__download_and_extract_all(metadata_list))
+
+    async def __download_and_extract_all(self, metadata_list):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("DownloadEngine=asyncio requires aiohttp (pip install aiohttp)")
+
+        create_dir(self.config.corpus_download_dir)
+        semaphore = asyncio.Semaphore(self.config.max_concurrent_downloads)
+        connector = aiohttp.TCPConnector(limit=self.config.max_concurrent_downloads)
+
+        # archives are unpacked (and added to the archive cache) by a single thread, off the event loop: unpacking is
+        # CPU bound anyway and neither the image store nor the archive cache is thread safe
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            async with aiohttp.ClientSession(connector=connector) as session:
+                results = await asyncio.gather(*[self.__download_and_extract(session, semaphore, executor, metadata)
+                                                 for metadata in metadata_list])
+        return sum(results)
+
+    async def __download_and_extract(self, session, semaphore, executor, metadata):
+        """Download (or get from the archive cache) and unpack one article archive, return 1 if retrieved, else 0"""
+        if self.disk_governor is not None and self.disk_governor.is_stopped():
+            return 0
+        output_file = self.config.corpus_download_dir + metadata['file_name']
+        cache_key = ArchiveCache.get_key(metadata['ftp_file_path'], metadata['file_name'], metadata['last_updated'])
+
+        loop = asyncio.get_running_loop()
+        from_cache = self.archive_cache is not None and \
+            await loop.run_in_executor(executor, self.archive_cache.fetch, cache_key, output_file)
+        if from_cache:
+            reservation = None
+            if self.disk_governor is not None:
+                reservation = await self.disk_governor.reserve_async(os.path.getsize(output_file), True)
+                if reservation is None:
+                    os.remove(output_file)
+                    return 0
+        else:
+            url = self.get_url(self.config.pubmed_ftp_path + metadata['ftp_file_path'], metadata['file_name'])
+            async with semaphore:
+                downloaded, reservation = await self.__download(session, executor, url, output_file)
+            if not downloaded:
+                if self.disk_governor is None or not self.disk_governor.is_stopped():
+                    self.num_failed += 1
+                return 0
+            if self.archive_cache is not None:
+                await loop.run_in_executor(executor, self.archive_cache.store, cache_key, output_file)
+
+        archive_size = os.path.getsize(output_file)
+        extracted_size = await loop.run_in_executor(executor, extract_tar_file, self.config.corpus_download_dir,
+                                                    output_file, self.image_store)
+        if self.disk_governor is not None:
+            self.disk_governor.release(reservation, archive_size, extracted_size, from_cache)
+        return 1
+
+    async def __download(self, session, executor, url, output_file):
+        """
+        Stream a URL to a file, return (true if successful, reservation made with the disk governor)
+        The file is not started unless the disk governor has room for it, given the size the server reports, and only
+        gets its final name once complete and verified
+        """
+
+        # remove an old copy first, as it may be a link to a cached archive
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        partial_file = output_file + PARTIAL_FILE_SUFFIX
+        reservation = None
+        try:
+            async with session.get(url, proxy=self.config.proxy if self.config.proxy else None) as response:
+                response.raise_for_status()
+                if self.disk_governor is not None:
+                    reservation = await self.disk_governor.reserve_async(response.content_length)
+                    if reservation is None:
+                        return False, None
+                with open(partial_file, 'wb') as file:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        file.write(chunk)
+                expected_size = response.content_length
+
+            error = ""
+            if expected_size is not None and os.path.getsize(partial_file) != expected_size:
+                error = "got " + str(os.path.getsize(partial_file)) + " of " + str(expected_size) + " bytes"
+            elif output_file.endswith(".tar.gz"):
+                error = await asyncio.get_running_loop().run_in_executor(executor, get_tar_file_error, partial_file)
+            if error != "":
+                raise IOError("Incomplete or corrupt download: " + error)
+            os.replace(partial_file, output_file)
+            return True, reservation
+        except Exception as e:
+            logging.exception("Error downloading PMC paper archive " + url)
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+            if reservation is not None:
+                self.disk_governor.cancel(reservation)
+            return False, None
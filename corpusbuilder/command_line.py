@@ -1,6 +1,8 @@
 import argparse
 import logging
 
+from corpusbuilder.helper import parse_shard
+
 
 class CommandLineForDownload:
     """Command line parser for download command"""
@@ -9,7 +11,10 @@ class CommandLineForDownload:
         parser = argparse.ArgumentParser(description="Description for my parser")
 
         parser.add_argument("-c", "--config", help="Enter path to config file", required=True, default="")
-        parser.add_argument("-s", "--search", help="Enter search term string (e.g. '(covid)+AND+(gel%20electrophoresis)')", required=True, default="")
+        search_group = parser.add_mutually_exclusive_group(required=True)
+        search_group.add_argument("-s", "--search", help="Enter search term string (e.g. '(covid)+AND+(gel%%20electrophoresis)')", default="")
+        search_group.add_argument("-q", "--query-file", help="Enter path to file with one search term string per line (batch mode)", default="")
+        search_group.add_argument("-p", "--pmcid-file", help="Enter path to verify-report.json, to only download the PMCIDs it flags", default="")
 
         self.argument = parser.parse_args()
 
@@ -17,6 +22,10 @@ class CommandLineForDownload:
             logging.info("Using config file: {0}".format(self.argument.config))
         if self.argument.search:
             logging.info("Using search terms: {0}".format(self.argument.search))
+        if self.argument.query_file:
+            logging.info("Using query file: {0}".format(self.argument.query_file))
+        if self.argument.pmcid_file:
+            logging.info("Using PMCID file: {0}".format(self.argument.pmcid_file))
 
     def get_config_file(self):
         return self.argument.config
@@ -24,6 +33,12 @@ class CommandLineForDownload:
     def get_search_terms(self):
         return self.argument.search
 
+    def get_query_file(self):
+        return self.argument.query_file
+
+    def get_pmcid_file(self):
+        return self.argument.pmcid_file
+
 
 class CommandLineForExtract:
     """Command line parser for extract command"""
@@ -33,8 +48,103 @@ class CommandLineForExtract:
 
         parser.add_argument("-c", "--config", help="Enter path to config file", required=True, default="")
         parser.add_argument("-f", "--file",
-                            help="Enter path to index file", required=True,
+                            help="Enter path to index file", required=False,
                             default="")
+        parser.add_argument("--pmcid-file", help="Enter path to verify-report.json, to only extract the PMCIDs it flags", default="")
+        parser.add_argument("--shard", help="Only extract shard i of N shards of the corpus, e.g. 0/4 (by stable hash of PMCID)", default="")
+        parser.add_argument("--queue", help="Enter path to SQLite work queue file shared by workers (created if missing)", default="")
+        parser.add_argument("--lease-seconds", help="Seconds before an unfinished PMCID in the work queue may be claimed by another worker",
+                            type=int, default=600)
+        parser.add_argument("--merge-reports", help="Merge run reports in the corpus extract directory and exit", action="store_true")
+
+        self.argument = parser.parse_args()
+
+        if not self.argument.file and not self.argument.merge_reports:
+            parser.error("the following arguments are required: -f/--file")
+        if self.argument.shard:
+            try:
+                parse_shard(self.argument.shard)
+            except ValueError as error:
+                parser.error(str(error))
+
+        if self.argument.config:
+            logging.info("Using config file: {0}".format(self.argument.config))
+        if self.argument.file:
+            logging.info("Using index file terms: {0}".format(self.argument.file))
+
+    def get_config_file(self):
+        return self.argument.config
+
+    def get_index_file(self):
+        return self.argument.file
+
+    def get_pmcid_file(self):
+        return self.argument.pmcid_file
+
+    def get_shard(self):
+        return self.argument.shard
+
+    def get_queue_file(self):
+        return self.argument.queue
+
+    def get_lease_seconds(self):
+        return self.argument.lease_seconds
+
+    def get_merge_reports(self):
+        return self.argument.merge_reports
+
+
+class CommandLineForQuery:
+    """Command line parser for query command"""
+
+    def __init__(self):
+        parser = argparse.ArgumentParser(description="Query the index of the extracted corpus")
+
+        parser.add_argument("-c", "--config", help="Enter path to config file", required=True, default="")
+        parser.add_argument("--journal", help="Journal name")
+        parser.add_argument("--year", help="Publication year", type=int)
+        parser.add_argument("--country", help="Country of an author affiliation")
+        parser.add_argument("--author", help="Part of an author name")
+        parser.add_argument("--license", help="License (e.g. 'CC BY')")
+        parser.add_argument("--caption", help="Words that table/figure captions must contain")
+        parser.add_argument("--fts-syntax", help="Read --caption as an SQLite FTS5 query (e.g. 'vaccine NOT mice')",
+                            action="store_true")
+        parser.add_argument("--records", help="Return table/figure records instead of PMCIDs", choices=["tables", "figures", "all"])
+        parser.add_argument("--rebuild", help="Re-index all JSON files in the corpus extract directory and exit", action="store_true")
+
+        self.argument = parser.parse_args()
+
+        if self.argument.config:
+            logging.info("Using config file: {0}".format(self.argument.config))
+
+    def get_config_file(self):
+        return self.argument.config
+
+    def get_filters(self):
+        """Return dict of the filters given, as expected by QueryIndex.query"""
+        return {name: getattr(self.argument, name) for name in ["journal", "year", "country", "author", "license", "caption"]
+                if getattr(self.argument, name) is not None}
+
+    def get_records(self):
+        return self.argument.records
+
+    def get_fts_syntax(self):
+        return self.argument.fts_syntax
+
+    def get_rebuild(self):
+        return self.argument.rebuild
+
+
+class CommandLineForServer:
+    """Command line parser for extraction server command"""
+
+    def __init__(self):
+        parser = argparse.ArgumentParser(description="Serve extraction requests from a warm process")
+
+        parser.add_argument("-c", "--config", help="Enter path to config file", required=True, default="")
+        parser.add_argument("-f", "--file", help="Enter path to index file (to look up licenses of extracted articles)", default="")
+        parser.add_argument("--host", help="Address to listen on", default="127.0.0.1")
+        parser.add_argument("--port", help="Port to listen on", type=int, default=8765)
 
         self.argument = parser.parse_args()
 
@@ -48,3 +158,35 @@ class CommandLineForExtract:
 
     def get_index_file(self):
         return self.argument.file
+
+    def get_host(self):
+        return self.argument.host
+
+    def get_port(self):
+        return self.argument.port
+
+
+class CommandLineForVerify:
+    """Command line parser for verify command"""
+
+    def __init__(self):
+        parser = argparse.ArgumentParser(description="Check the corpus download and extract directories for corrupt or incomplete items")
+
+        parser.add_argument("-c", "--config", help="Enter path to config file", required=True, default="")
+        parser.add_argument("--workers", help="Number of processes checking items (default: one per CPU)", type=int, default=None)
+        parser.add_argument("--delete", help="Delete corrupt or incomplete items, so that they are fetched or extracted again",
+                            action="store_true")
+
+        self.argument = parser.parse_args()
+
+        if self.argument.config:
+            logging.info("Using config file: {0}".format(self.argument.config))
+
+    def get_config_file(self):
+        return self.argument.config
+
+    def get_workers(self):
+        return self.argument.workers
+
+    def get_delete(self):
+        return self.argument.delete
@@ -1,5 +1,7 @@
 import configparser
 
+from corpusbuilder.helper import ENTITY_REPLACEMENT_SETS
+
 class Config:
     """Configuration items needed to build corpus"""
      
@@ -11,11 +13,31 @@ class Config:
     # for retrieving PMC index file and documents
     pubmed_ftp_server = ""
     pubmed_ftp_path = ""
+    pubmed_https_url = ""       # HTTPS mirror of the PubMed FTP server (for the asyncio download engine)
+    download_engine = "pycurl"  # pycurl (one file at a time) or asyncio (concurrent HTTPS downloads)
+    max_concurrent_downloads = 16
     index_file_name = ""
     index_file_local = ""
+    licenses = []               # only articles with one of these licenses are retrieved
     corpus_download_dir = ""    # for downloaded corpus files 
     corpus_extract_dir = ""     # for files (e.g. json) extracted from downloaded corpus files
     proxy = ""
+    max_download_bytes = 0      # budget of bytes downloaded per run (0 for no budget)
+    min_free_bytes = 0          # downloads pause, then stop, when free space in the corpus download dir would drop below this (0 to not check)
+    low_space_pause_seconds = 0 # how long downloads wait for space to be freed before stopping
+    archive_cache_dir = ""      # if not blank, folder of a local cache of article archives shared across runs
+    archive_cache_max_bytes = 0 # size cap of the archive cache (0 for no cap)
+    image_store_dir = ""        # if not blank, folder of a content-addressed store of images shared across articles
+
+    # for extracting data from downloaded corpus files
+    spacy_model = ""
+    affiliation_ner = "spacy"           # spacy, rules or tiered (rules with spacy fallback)
+    affiliation_ner_min_confidence = 1.0
+    entity_replacements = "default"     # default or extended set of character references replaced in NXML
+    query_index_file = ""               # if not blank, SQLite file indexing the extracted JSON (updated as articles are extracted)
+    sidecar_threshold_bytes = 0         # table HTML and captions larger than this go to sidecar files (0 to keep all in the JSON)
+    bounded_memory = False              # release parts of the document tree as soon as they are processed
+    report_peak_memory = False          # log peak memory per article (slows extraction down)
 
     def __init__(self, config_file_path):
         """Read the config from a file"""
@@ -26,13 +48,34 @@ class Config:
         self.max_pmcids = config["DEFAULT"]["MaxPMCIDs"]
         self.pubmed_ftp_server = config["DEFAULT"]["PubMedFTPServer"]
         self.pubmed_ftp_path = config["DEFAULT"]["PubMedFTPPath"]
+        self.pubmed_https_url = config["DEFAULT"].get("PubMedHTTPSURL", "https://" + self.pubmed_ftp_server)
+        self.download_engine = config["DEFAULT"].get("DownloadEngine", "pycurl").strip()
+        self.max_concurrent_downloads = int(config["DEFAULT"].get("MaxConcurrentDownloads", "16"))
         self.index_file_name = config["DEFAULT"]["IndexFileName"]
         self.index_file_local = config["DEFAULT"]["IndexFileLocal"]
+        self.licenses = [license.strip() for license in config["DEFAULT"].get("Licenses", "CC BY, CC0").split(",") if license.strip()]
         self.corpus_download_dir = config["DEFAULT"]["CorpusDownloadDir"]
         self.accession_id_csvheader, self.file_url_csvheader, self.license_csvheader = self.get_csv_header_name(config["DEFAULT"]["IndexFileCSVHeaders"])
+        self.last_updated_csvheader = config["DEFAULT"].get("IndexFileLastUpdatedCSVHeader", "Last Updated (YYYY-MM-DD HH:MM:SS)")
         self.corpus_extract_dir = config["DEFAULT"]["CorpusExtractDir"]
         self.proxy = config["DEFAULT"]["Proxy"]
+        self.image_store_dir = config["DEFAULT"].get("ImageStoreDir", "")
+        self.max_download_bytes = int(config["DEFAULT"].get("MaxDownloadBytes", "0"))
+        self.min_free_bytes = int(config["DEFAULT"].get("MinFreeBytes", "0"))
+        self.low_space_pause_seconds = int(config["DEFAULT"].get("LowSpacePauseSeconds", "0"))
+        self.archive_cache_dir = config["DEFAULT"].get("ArchiveCacheDir", "")
+        self.archive_cache_max_bytes = int(config["DEFAULT"].get("ArchiveCacheMaxBytes", "0"))
         self.spacy_model = config["DEFAULT"]["SpacyModel"]
+        self.affiliation_ner = config["DEFAULT"].get("AffiliationNER", "spacy").strip()
+        self.affiliation_ner_min_confidence = float(config["DEFAULT"].get("AffiliationNERMinConfidence", "1.0"))
+        self.entity_replacements = config["DEFAULT"].get("EntityReplacements", "default").strip()
+        if self.entity_replacements not in ENTITY_REPLACEMENT_SETS:
+            raise ValueError("Invalid EntityReplacements=" + self.entity_replacements + " in " + config_file_path +
+                             ", expected one of: " + ", ".join(sorted(ENTITY_REPLACEMENT_SETS)))
+        self.query_index_file = config["DEFAULT"].get("QueryIndexFile", "")
+        self.sidecar_threshold_bytes = int(config["DEFAULT"].get("SidecarThresholdBytes", "0"))
+        self.bounded_memory = config["DEFAULT"].getboolean("BoundedMemory", False)
+        self.report_peak_memory = config["DEFAULT"].getboolean("ReportPeakMemory", False)
 
     @staticmethod
     def get_csv_header_name(csv_headers):
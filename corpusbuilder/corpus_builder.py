@@ -3,13 +3,18 @@ A module for building a corpus
 """
 
 import logging
-import requests
 import xml.etree.ElementTree as ET
+from functools import lru_cache
 from corpusbuilder.ftp_download import FTPDownload
 from corpusbuilder.document_index import DocumentIndex
+from corpusbuilder.image_store import ImageStore
+from corpusbuilder.jats_lookup import JatsLookup
+from corpusbuilder.archive_cache import ArchiveCache
+from corpusbuilder.disk_governor import DiskGovernor
+from corpusbuilder.affiliation_resolver import AffiliationResolver, spacy_name_location
 from corpusbuilder.helper import *
-import geonamescache
-import copy
+
+# requests, geonamescache and bs4 are imported where they are used, to keep start-up fast for short runs
 
 class CorpusBuilder:
     """A class for building a corpus"""
@@ -17,11 +22,16 @@ class CorpusBuilder:
     config = ""
     search_terms = ""
     pmcid_list = []
+    pmc_ids = None
 
-    def __init__(self, config, search_terms):
-        """Constructor"""
+    def __init__(self, config, search_terms, pmc_ids=None):
+        """
+        Constructor, given config and search terms string (or list of search terms strings, for a batch of queries),
+        or PMCIDs (e.g. PMC123) to retrieve without searching, such as those flagged by verify_corpus.py
+        """
         self.config = config
         self.search_terms = search_terms
+        self.pmc_ids = pmc_ids
 
         # exit if no email address configured
         if self.config.email is None or self.config.email.strip() == "":
@@ -34,11 +44,13 @@ class CorpusBuilder:
         """Build the corpus"""
 
         # retrieve pmcids for the search terms
-        self.pmcid_list = self.__retrieve_pmcids()
-        logging.info('Retrieved ' + str(len(self.pmcid_list)) + ' PMCIDs: ' + str(self.pmcid_list))
+        self.retrieve_all_pmcids()
 
-        # instantiate FTPDownload object
-        ftp_download = FTPDownload(self.config)
+        # instantiate FTPDownload object, using a local archive cache if configured
+        archive_cache = None
+        if self.config.archive_cache_dir:
+            archive_cache = ArchiveCache(self.config.archive_cache_dir, self.config.archive_cache_max_bytes)
+        ftp_download = FTPDownload(self.config, archive_cache)
 
         # retrieve index file
         index_file = ftp_download.get_index_file()
@@ -46,25 +58,115 @@ class CorpusBuilder:
         # instantiate file metadata from index file
         document_index = DocumentIndex(index_file, self.config)
 
+        # keep the run within the download budget and free disk space, and count bytes downloaded and unpacked
+        create_dir(self.config.corpus_download_dir)
+        disk_governor = DiskGovernor(self.config.corpus_download_dir, self.config.max_download_bytes,
+                                     self.config.min_free_bytes, self.config.low_space_pause_seconds)
+
+        # store each distinct image once, if an image store is configured
+        image_store = None
+        if self.config.image_store_dir:
+            image_store = ImageStore(self.config.image_store_dir)
+
+        # get metadata for all PMCIDs at once (PMCIDs not in the index or with a license that is not allowed are left out)
+        accession_ids = ['PMC' + pmcid for pmcid in self.pmcid_list]
+        metadata_list = document_index.get_metadata_many(accession_ids)
+        num_license_rejected = len(document_index.get_license_rejected(accession_ids))
+        logging.info(str(len(metadata_list)) + ' PMCIDs to retrieve, ' + str(num_license_rejected) + ' rejected by license, ' +
+                     str(len(set(accession_ids)) - len(metadata_list) - num_license_rejected) + ' not in index')
+
         # for each PMCID, download and extract tar file
         logging.info('Retrieving PMC articles...')
         num_processed = 0
-        for pmcid in self.pmcid_list:
-            metadata = document_index.get_metadata('PMC' + pmcid)  # gets metadata and also checks license
-            if metadata['result'] is True:
-                ftp_download.download_ftp_file(self.config.pubmed_ftp_path + metadata['ftp_file_path'],
-                                               metadata['file_name'])
-                tar_file_path = self.config.corpus_download_dir + metadata['file_name']
-                extract_tar_file(self.config.corpus_download_dir, tar_file_path)
-                num_processed = num_processed + 1
+        if self.config.download_engine == "asyncio":
+            # asyncio and aiohttp are only imported for this engine, to keep start-up fast otherwise
+            from corpusbuilder.async_download import AsyncDownload
+            async_download = AsyncDownload(self.config, archive_cache, image_store, disk_governor)
+            num_processed = async_download.download_and_extract_all(metadata_list)
+        else:
+            num_processed = self.download_and_extract_all(metadata_list, ftp_download, archive_cache, image_store, disk_governor)
 
         logging.info('Retrieved documents for ' + str(num_processed) + ' of ' + str(len(self.pmcid_list)) + ' PMCIDs')
+        disk_governor.log_report()
+        if archive_cache is not None:
+            archive_cache.log_stats()
+        if image_store is not None:
+            image_store.log_report()
+
+    def download_and_extract_all(self, metadata_list, ftp_download, archive_cache, image_store, disk_governor):
+        """Download (or get from the archive cache) and unpack article archives one at a time, return number retrieved"""
+        num_processed = 0
+        for metadata in metadata_list:
+            ftp_file_path = self.config.pubmed_ftp_path + metadata['ftp_file_path']
+            cache_key = ArchiveCache.get_key(metadata['ftp_file_path'], metadata['file_name'], metadata['last_updated'])
+            tar_file_path = self.config.corpus_download_dir + metadata['file_name']
+
+            # reserve room for the archive and its unpacked files, then take it from the cache
+            from_cache = False
+            cached_size = archive_cache.get_size(cache_key) if archive_cache is not None else None
+            if cached_size is not None:
+                reservation = disk_governor.reserve(cached_size, from_cache=True)
+                if reservation is None:
+                    break
+                from_cache = archive_cache.fetch(cache_key, tar_file_path)
+                if not from_cache:
+                    disk_governor.cancel(reservation)
+
+            # or, if it is not cached (or the cached copy was corrupt and evicted), reserve room for downloading it
+            if not from_cache:
+                archive_size = None
+                if disk_governor.is_limited():
+                    archive_size = ftp_download.get_remote_file_size(ftp_file_path, metadata['file_name'])
+                reservation = disk_governor.reserve(archive_size)
+                if reservation is None:
+                    break
+                ftp_download.download_ftp_file(ftp_file_path, metadata['file_name'], cache_key, try_cache=False)
+
+            # the download may have failed
+            if not os.path.exists(tar_file_path):
+                disk_governor.cancel(reservation)
+                continue
+            archive_size = os.path.getsize(tar_file_path)
+            extracted_size = extract_tar_file(self.config.corpus_download_dir, tar_file_path, image_store)
+            disk_governor.release(reservation, archive_size, extracted_size, from_cache)
+            num_processed = num_processed + 1
+        return num_processed
+
+    def retrieve_all_pmcids(self):
+        """
+        Retrieve PMCIDs for the search terms into pmcid_list, removing duplicates across queries
+        In batch mode (a list of search terms), also write which PMCIDs each query matched to query-pmcids.json
+        If given PMCIDs instead, only those are retrieved
+        """
+        if self.pmc_ids is not None:
+            self.pmcid_list = list(dict.fromkeys(pmc_id[len('PMC'):] if pmc_id.startswith('PMC') else pmc_id
+                                                 for pmc_id in self.pmc_ids))
+            logging.info('Retrieving ' + str(len(self.pmcid_list)) + ' given PMCIDs: ' + str(self.pmcid_list))
+            return self.pmcid_list
+
+        batch_mode = isinstance(self.search_terms, list)
+        queries = self.search_terms if batch_mode else [self.search_terms]
+        query_pmcids = {}
+        for query in queries:
+            query_pmcids[query] = self.__retrieve_pmcids(query)
+        self.pmcid_list = list(dict.fromkeys(pmcid for pmcids in query_pmcids.values() for pmcid in pmcids))
+        logging.info('Retrieved ' + str(len(self.pmcid_list)) + ' PMCIDs: ' + str(self.pmcid_list))
+
+        if batch_mode:
+            logging.info('Retrieved ' + str(sum(len(pmcids) for pmcids in query_pmcids.values())) + ' PMCIDs for ' +
+                         str(len(queries)) + ' queries, ' + str(len(self.pmcid_list)) + ' after removing duplicates')
+            create_dir(self.config.corpus_download_dir)
+            write_json(self.config.corpus_download_dir, 'query-pmcids',
+                       {query: ['PMC' + pmcid for pmcid in pmcids] for query, pmcids in query_pmcids.items()})
+        return self.pmcid_list
 
-    def __retrieve_pmcids(self):
+    def __retrieve_pmcids(self, search_terms):
         """Retrieve list of PMCIDs from PubMed, given search terms"""
 
+        import requests
+
         # execute call to PubMedCentral Search API (if behind firewall, may need HTTPS_PROXY environment variable)
-        url = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?db=pmc&term=' + self.search_terms + '&tool=' + self.config.tool + "&email=" + self.config.email
+        url = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?db=pmc&term=' + search_terms + '&tool=' + self.config.tool + "&email=" + self.config.email
         if self.config.max_pmcids is not None:
             url = url + '&retmax=' + str(self.config.max_pmcids)
         r = requests.get(url, allow_redirects=True)
@@ -72,7 +174,7 @@ class CorpusBuilder:
         logging.info(url)
 
         # write XML to file
-        file_name = 'search-results-' + self.search_terms + '.xml'
+        file_name = 'search-results-' + search_terms + '.xml'
         open(file_name, 'wb').write(r.content)
 
         # parse XML to get PMCIDs
@@ -103,23 +205,23 @@ class CorpusBuilder:
         if journal_meta is not None:
             publisher = journal_meta.find('publisher')
             if publisher is not None:
-                if publisher.find('publisher-name') is not None:
-                    publisher_dict["publisher_name"] = publisher.find('publisher-name').text
-                if publisher.find('publisher-loc') is not None:
-                    publisher_dict["publisher_location"] = publisher.find('publisher-loc').text
+                publisher_name = publisher.find('publisher-name')
+                if publisher_name is not None:
+                    publisher_dict["publisher_name"] = publisher_name.text
+                publisher_loc = publisher.find('publisher-loc')
+                if publisher_loc is not None:
+                    publisher_dict["publisher_location"] = publisher_loc.text
         return publisher_dict
 
     @staticmethod
     def get_journal(soup):
         """Returns journal dict if available in the soup element"""
         journal_dict = {"journal_name": ""}
-        if soup.find('journal-title-group') is not None:
-            journal_title_group = soup.find('journal-title-group')
-            if journal_title_group is not None:
-                journal_title = journal_title_group.find('journal-title')
-                if journal_title is not None:
-                    journal_dict["journal_name"] = journal_title.text
-                    return journal_dict
+        journal_title_group = soup.find('journal-title-group')
+        if journal_title_group is not None:
+            journal_title = journal_title_group.find('journal-title')
+            if journal_title is not None:
+                journal_dict["journal_name"] = journal_title.text
         return journal_dict
 
     @staticmethod
@@ -133,10 +235,12 @@ class CorpusBuilder:
                 if contrib.attrs['contrib-type'] == 'author':
                     surname = ""
                     given_names = ""
-                    if contrib.find('surname') is not None:
-                        surname = contrib.find('surname').text
-                    if contrib.find('given-names') is not None:
-                        given_names = contrib.find('given-names').text
+                    surname_tag = contrib.find('surname')
+                    if surname_tag is not None:
+                        surname = surname_tag.text
+                    given_names_tag = contrib.find('given-names')
+                    if given_names_tag is not None:
+                        given_names = given_names_tag.text
 
                     xref_tag = contrib.find_all('xref')
                     affiliation_list = []
@@ -167,12 +271,15 @@ class CorpusBuilder:
                 day = ""
                 month = ""
                 year = ""
-                if pub_date.find('day') is not None:
-                    day = int(pub_date.find('day').text)
-                if pub_date.find('month') is not None:
-                    month = int(pub_date.find('month').text)
-                if pub_date.find('year') is not None:
-                    year = int(pub_date.find('year').text)
+                day_tag = pub_date.find('day')
+                if day_tag is not None:
+                    day = int(day_tag.text)
+                month_tag = pub_date.find('month')
+                if month_tag is not None:
+                    month = int(month_tag.text)
+                year_tag = pub_date.find('year')
+                if year_tag is not None:
+                    year = int(year_tag.text)
                 publication_dict = {"day": day,
                                     "month": month,
                                     "year": year}
@@ -182,44 +289,41 @@ class CorpusBuilder:
     def get_publication_date(soup):
         """Returns publication dict if available in the soup element"""
         publication_dict = dict()
-        pub_date_list = soup.select("pub-date[pub-type^=epub]")
-        if pub_date_list is not None and len(pub_date_list) != 0:
+        pub_dates = soup.find_all('pub-date')
+        # i.e. pub-date[pub-type^=epub]
+        pub_date_list = [pub_date for pub_date in pub_dates if pub_date.get('pub-type', '').startswith('epub')]
+        if len(pub_date_list) != 0:
             publication_dict = CorpusBuilder.get_date_from_pub_tag(pub_date_list)
         else:
-            pub_date_list = soup.select("pub-date[date-type^=pub][publication-format^=electronic]")
-            if pub_date_list is not None and len(pub_date_list) != 0:
+            # i.e. pub-date[date-type^=pub][publication-format^=electronic]
+            pub_date_list = [pub_date for pub_date in pub_dates if pub_date.get('date-type', '').startswith('pub') and
+                             pub_date.get('publication-format', '').startswith('electronic')]
+            if len(pub_date_list) != 0:
                 publication_dict = CorpusBuilder.get_date_from_pub_tag(pub_date_list)
         return publication_dict
 
     @staticmethod
     def get_funding_group(soup):
         """Returns funding group if available in the soup element"""
-        if soup.find('funding-group') is not None:
-            funding_group = soup.find('funding-group')
-            if funding_group is not None:
-                funding_source = funding_group.find('funding-source')
-                if funding_source is not None:
-                    return funding_source.text
-                else:
-                    return ""
+        funding_group = soup.find('funding-group')
+        if funding_group is not None:
+            funding_source = funding_group.find('funding-source')
+            if funding_source is not None:
+                return funding_source.text
             else:
                 return ""
-        elif soup.find('grant-num') is not None:
-            grant_num = soup.find('grant-num')
-            if grant_num is not None:
-                grant_sponsor = grant_num.find('grant-sponsor')
-                if grant_sponsor is not None:
-                    return grant_sponsor.text
-                else:
-                    return ""
+        grant_num = soup.find('grant-num')
+        if grant_num is not None:
+            grant_sponsor = grant_num.find('grant-sponsor')
+            if grant_sponsor is not None:
+                return grant_sponsor.text
             else:
                 return ""
-        else:
-            return ""
+        return ""
 
     @staticmethod
-    def get_figures(soup, image_files):
-        """Returns figure dict, given soup element and image_files in the directory"""
+    def get_figures(soup, image_files, image_store=None):
+        """Returns figure dict, given soup element and image_files in the directory (files point into image_store, if given)"""
         figure_list = []
         figures = soup.find_all('fig')
         for figure in figures:
@@ -236,6 +340,8 @@ class CorpusBuilder:
                     graphic = graphic_tag.attrs['xlink:href']
                     for file in image_files:
                         if graphic in file:
+                            if image_store is not None:
+                                file = image_store.get_canonical_path(file)
                             files.append(replace_slashes(file))
                 label_tag = figure.find('label')
                 if label_tag is not None:
@@ -316,45 +422,28 @@ class CorpusBuilder:
 
     @staticmethod
     def _get_name_location(nlp, sentence):
-        """Returns name and location in a dict, given spacy module and affiliation sentence"""
-        dic = {"name": "",
-               "location": ""
-               }
-        sentence_tuple = nlp(sentence).ents
-        entity = ""
-        remaining_sentence = ""
-        for i in range(len(sentence_tuple)):
-            ent = sentence_tuple[i]
-            if ent.label_ == 'ORG':
-                entity = ent.text
-            else:
-                if dic['name'] == "" and entity != "":
-                    name = sentence[:sentence.find(entity) + len(entity)]
-                    remaining_sentence = sentence[len(name) + 1:].strip()
-                    dic['name'] = name.strip()
-                    entity = ""
-                entity = ent.text
-        if dic['name'] != "":
-            location = remaining_sentence[:remaining_sentence.find(entity) + len(entity)]
-            dic['location'] = location
-        else:
-            name = sentence[:sentence.find(entity) + len(entity)]
-            dic['name'] = name.strip()
-
-        return dic
+        """Returns name and location in a dict, given spacy module (or AffiliationResolver) and affiliation sentence"""
+        if isinstance(nlp, AffiliationResolver):
+            return nlp.get_name_location(sentence)
+        return spacy_name_location(nlp, sentence)
 
     @staticmethod
-    def get_affiliation(aff, nlp):
-        """Returns affiliation in a dict, given affiliation string, spacy module and countries list"""
+    @lru_cache(maxsize=None)
+    def get_countries():
+        """Returns tuple of country names matched in affiliations (built once per process)"""
+        import geonamescache
 
-        # get nested dictionary for countries
-        # TODO if make these functions non-static, then create country dictionary only once upon initialization.  Keeping it here for now to facilitate testing of get_affiliation (and it runs in millisecs)
-        gc = geonamescache.GeonamesCache()
-        countries = gc.get_countries()
-        countries = [*gen_dict_extract(countries, 'name')]
+        countries = [*gen_dict_extract(geonamescache.GeonamesCache().get_countries(), 'name')]
         countries.append("USA")
         countries.append("United States of America")
         countries.append("UK")
+        return tuple(countries)
+
+    @staticmethod
+    def get_affiliation(aff, nlp):
+        """Returns affiliation in a dict, given affiliation string, spacy module and countries list"""
+
+        countries = CorpusBuilder.get_countries()
 
         aff_dic = {
             "name": "",
@@ -364,22 +453,19 @@ class CorpusBuilder:
         if aff.find('institution-wrap') is not None:
             aff_dic["name"] = CorpusBuilder.get_institution(aff)  # name
 
-            temp = copy.copy(aff)
-
-            CorpusBuilder.decompose_tag(temp, 'institution-wrap')
-            CorpusBuilder.decompose_tag(temp, 'label')
-
-            location_country = temp.get_text().strip()
+            location_country = get_text_excluding_tags(aff, ['institution-wrap', 'label']).strip()
 
             loc_country_dic = CorpusBuilder._separate_location_country(countries, location_country)
 
-            if CorpusBuilder.get_address_line(aff) != "":
-                aff_dic["location"] = CorpusBuilder.get_address_line(aff)
+            address_line = CorpusBuilder.get_address_line(aff)
+            if address_line != "":
+                aff_dic["location"] = address_line
             else:
                 aff_dic["location"] = remove_comma(loc_country_dic["location"])
 
-            if CorpusBuilder.get_country(aff) != "":
-                aff_dic["country"] = CorpusBuilder.get_country(aff)
+            country = CorpusBuilder.get_country(aff)
+            if country != "":
+                aff_dic["country"] = country
             else:
                 aff_dic["country"] = loc_country_dic["country"]
 
@@ -388,37 +474,25 @@ class CorpusBuilder:
 
             aff_dic['name'] = CorpusBuilder.get_institution(aff)
 
-            temp = copy.copy(aff)
-
-            CorpusBuilder.decompose_tag(temp, 'institution')
-            CorpusBuilder.decompose_tag(temp, 'label')
-            CorpusBuilder.decompose_tag(temp, 'sup')
-            CorpusBuilder.decompose_tag(temp, 'named-content')
-
-            location_country = temp.get_text().strip()
+            location_country = get_text_excluding_tags(aff, ['institution', 'label', 'sup', 'named-content']).strip()
             loc_country_dic = CorpusBuilder._separate_location_country(countries, location_country)
 
-            if CorpusBuilder.get_address_line(aff) != "":
-                aff_dic["location"] = CorpusBuilder.get_address_line(aff)
+            address_line = CorpusBuilder.get_address_line(aff)
+            if address_line != "":
+                aff_dic["location"] = address_line
             else:
                 aff_dic["location"] = remove_comma(loc_country_dic["location"])
 
-            if CorpusBuilder.get_country(aff) != "":
-                aff_dic["country"] = CorpusBuilder.get_country(aff)
+            country = CorpusBuilder.get_country(aff)
+            if country != "":
+                aff_dic["country"] = country
             else:
                 aff_dic["country"] = loc_country_dic["country"]
 
             return aff_dic
         else:
-            temp = copy.copy(aff)
-            CorpusBuilder.decompose_tag(temp, 'institution-wrap')
-            CorpusBuilder.decompose_tag(temp, 'institution')
-            CorpusBuilder.decompose_tag(temp, 'label')
-            CorpusBuilder.decompose_tag(temp, 'sup')
-            CorpusBuilder.decompose_tag(temp, 'email')
-            CorpusBuilder.decompose_tag(temp, 'named-content')
-
-            institution_loc_country = temp.get_text().strip()
+            institution_loc_country = get_text_excluding_tags(aff, ['institution-wrap', 'institution', 'label', 'sup',
+                                                                     'email', 'named-content']).strip()
 
             loc_country_dic = CorpusBuilder._separate_location_country(countries, institution_loc_country)
             aff_dic["country"] = loc_country_dic["country"]
@@ -435,8 +509,8 @@ class CorpusBuilder:
 
         affiliations = dict()
 
-        for aff in aff_tags:
-            aff_id = aff_tags.index(aff)
+        for aff_index, aff in enumerate(aff_tags):
+            aff_id = aff_index
             if 'id' in aff.attrs:
                 aff_id = aff.attrs['id']
             affiliations[aff_id] = CorpusBuilder.get_affiliation(aff, nlp)
@@ -444,8 +518,16 @@ class CorpusBuilder:
         return affiliations
 
     @staticmethod
-    def populate_template(nlp, pmc_id, nxml_file_path, license, image_files):
-        """Returns generated JSON template, given pmc_id, nxml_file_path, license and image files in the directory"""
+    def populate_template(nlp, pmc_id, nxml_file_path, license, image_files, bounded_memory=False, image_store=None,
+                          entity_replacements=None):
+        """
+        Returns generated JSON template, given pmc_id, nxml_file_path, license and image files in the directory
+
+        With bounded_memory, parts of the soup are decomposed as soon as they have been processed
+        With image_store, figure files point to the canonical copy of each image in the store
+        With entity_replacements (code point -> string), these replace character references instead of ENTITY_REPLACEMENTS
+        """
+        from bs4 import BeautifulSoup as bs4
 
         template_json = {'pmc_id': pmc_id,
                          'metadata': {"license": license,
@@ -456,46 +538,40 @@ class CorpusBuilder:
                          "html_tables": [],
                          "image_tables": [],
                          'figures': []}
-        xml_data = ''
 
+        # read the file once and replace specific encoded characters, for example space and dash
         with open(nxml_file_path, encoding='utf-8') as xml_file:
-            xml_data = xml_file.readlines()
+            soup = bs4(replace_encodings(xml_file.read(), entity_replacements), 'html.parser')
 
-        xml_file.close()
-
-        xml_data_str = ''.join(xml_data)
-
-        # replace specific encoded characters, for example space and dash
-        xml_data_str = replace_encodings(xml_data_str)
-
-        soup = bs4(xml_data_str, 'html.parser')
+        # locate the elements needed by the getters once, the getters then use the lookup instead of traversing the soup
+        lookup = JatsLookup(soup)
 
         # Get list of affiliation dic {"name":"", "location":"", "country":""}
-        affiliations = CorpusBuilder.get_all_affiliations(nlp, soup)
+        affiliations = CorpusBuilder.get_all_affiliations(nlp, lookup)
+        if bounded_memory:
+            CorpusBuilder.decompose_tag(soup, 'aff')
 
         # Addition of provenance field meta data
-        template_json['metadata']['article_title'] = CorpusBuilder.get_article_title(soup)
-        template_json['metadata']['provenance']['authors'] = CorpusBuilder.get_authors(affiliations, soup)
-        template_json['metadata']['provenance']['publisher'] = CorpusBuilder.get_publisher(soup)
-        template_json['metadata']['provenance']['publication_date'] = CorpusBuilder.get_publication_date(soup)
-        template_json['metadata']['provenance']['funding_group'] = CorpusBuilder.get_funding_group(soup)
-        template_json['metadata']['provenance']['publisher'] = append_dict(CorpusBuilder.get_journal(soup),
-                                                                           CorpusBuilder.get_publisher(soup))
+        template_json['metadata']['article_title'] = CorpusBuilder.get_article_title(lookup)
+        template_json['metadata']['provenance']['authors'] = CorpusBuilder.get_authors(affiliations, lookup)
+        template_json['metadata']['provenance']['publication_date'] = CorpusBuilder.get_publication_date(lookup)
+        template_json['metadata']['provenance']['funding_group'] = CorpusBuilder.get_funding_group(lookup)
+        template_json['metadata']['provenance']['publisher'] = append_dict(CorpusBuilder.get_journal(lookup),
+                                                                           CorpusBuilder.get_publisher(lookup))
 
         # Addition of figures
-        template_json['figures'] = CorpusBuilder.get_figures(soup, image_files)
+        template_json['figures'] = CorpusBuilder.get_figures(lookup, image_files, image_store)
 
-        tables = soup.find_all('table-wrap')
+        tables = lookup.find_all('table-wrap')
         tables_list = []
         image_table_list = []
 
         for table in tables:
-            s = bs4(str(table), 'html.parser')
-            table_html = s.find('table')  # table
-            table_label = s.find('label')
-            table_caption = s.find('caption')
-            table_footer = s.find('table-wrap-foot')
-            table_image = s.find('graphic')
+            table_html = table.find('table')  # table
+            table_label = table.find('label')
+            table_caption = table.find('caption')
+            table_footer = table.find('table-wrap-foot')
+            table_image = table.find('graphic')
             if table_html is not None:
                 table_dic = {
                     "id": (clean_text(get_text_from_tag(table_label))),
@@ -515,6 +591,11 @@ class CorpusBuilder:
                     "references": []
                 }
                 image_table_list.append(image_dic)
+            if bounded_memory and table.find('table-wrap') is None:
+                table.decompose()
+
+        if bounded_memory:
+            soup.decompose()
 
         template_json['html_tables'] = tables_list
         template_json['image_tables'] = image_table_list
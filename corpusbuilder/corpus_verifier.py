@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from corpusbuilder.sidecar import SIDECAR_FIELDS, load_sidecar
+from corpusbuilder.helper import PARTIAL_FILE_SUFFIX, get_tar_file_error
+
+# bytes read from the end of an NXML file to check that it is complete
+NXML_TAIL_BYTES = 64
+
+
+def verify_archive(path):
+    """Return why an archive left in the corpus download directory is corrupt, or "" if it is sound"""
+    return get_tar_file_error(path)
+
+
+def verify_article_download(path):
+    """Return why an article folder in the corpus download directory is incomplete, or "" if it looks complete"""
+    nxml_files = [file for file in os.listdir(path) if file.endswith(".nxml")]
+    if len(nxml_files) == 0:
+        return "no .nxml file"
+    for nxml_file in nxml_files:
+        with open(os.path.join(path, nxml_file), 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            file.seek(max(0, file.tell() - NXML_TAIL_BYTES))
+            if not file.read().rstrip().endswith(b"</article>"):
+                return nxml_file + " is truncated"
+    return ""
+
+
+def verify_article_extract(path):
+    """Return why an article folder in the corpus extract directory is incomplete or corrupt, or "" if it is sound"""
+    pmc_id = os.path.basename(path)
+    json_file_path = os.path.join(path, pmc_id + ".json")
+    if not os.path.isfile(json_file_path):
+        return "no " + pmc_id + ".json"
+    try:
+        with open(json_file_path, 'r') as file:
+            extract_json = json.load(file)
+        if extract_json.get('pmc_id') != pmc_id:
+            return "JSON is for " + str(extract_json.get('pmc_id'))
+        for section, fields in SIDECAR_FIELDS.items():
+            for entry in extract_json[section]:
+                for field in fields:
+                    load_sidecar(entry.get(field), path)
+    except (OSError, EOFError, ValueError, KeyError) as error:
+        return str(error)
+    return ""
+
+
+def verify_item(item):
+    """Return (kind, path, error) for one item found by CorpusVerifier.find_items, error being "" if it is sound"""
+    kind, path = item
+    if kind == "partial":
+        return kind, path, "partial file left by an interrupted write"
+    verify = {"archive": verify_archive, "download": verify_article_download, "extract": verify_article_extract}[kind]
+    try:
+        return kind, path, verify(path)
+    except Exception as error:
+        return kind, path, str(error)
+
+
+class CorpusVerifier(object):
+    """Checks the corpus download and extract directories for partial files, corrupt archives and incomplete articles"""
+
+    def __init__(self, config, max_workers=None):
+        self.config = config
+        self.max_workers = max_workers      # number of processes checking items (None for one per CPU)
+
+    def find_items(self):
+        """Return list of (kind, path) to check: partial files, archives left unextracted and article folders"""
+        items = []
+        for kind, corpus_dir in [("download", self.config.corpus_download_dir), ("extract", self.config.corpus_extract_dir)]:
+            if not os.path.isdir(corpus_dir):
+                continue
+            for root, dirs, files in os.walk(corpus_dir):
+                for file in files:
+                    if file.endswith(PARTIAL_FILE_SUFFIX):
+                        items.append(("partial", os.path.join(root, file)))
+                    elif kind == "download" and file.endswith(".tar.gz"):
+                        items.append(("archive", os.path.join(root, file)))
+            for entry in sorted(os.listdir(corpus_dir)):
+                if entry.startswith("PMC") and os.path.isdir(os.path.join(corpus_dir, entry)):
+                    items.append((kind, os.path.join(corpus_dir, entry)))
+        return items
+
+    def verify(self):
+        """Check all items in parallel, return list of (kind, path, error) for those that are corrupt or incomplete"""
+        items = self.find_items()
+        logging.info('Verifying ' + str(len(items)) + ' items in ' + self.config.corpus_download_dir + ' and ' +
+                     self.config.corpus_extract_dir + '...')
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(verify_item, items, chunksize=16))
+        return [result for result in results if result[2] != ""]
+
+    @staticmethod
+    def get_pmc_ids(problems):
+        """Return sorted PMCIDs of the articles affected by the problems found, i.e. to download or extract again"""
+        pmc_ids = set()
+        for kind, path, error in problems:
+            name = os.path.basename(path)
+            if kind in ["download", "extract"]:
+                pmc_ids.add(name)
+            elif name.startswith("PMC"):
+                pmc_ids.add(name.split(".")[0])
+        return sorted(pmc_ids)
+
+    @staticmethod
+    def delete(problems):
+        """Delete corrupt or incomplete items, so that the next download/extract run fetches or writes them again"""
+        for kind, path, error in problems:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            logging.info('Deleted ' + path)
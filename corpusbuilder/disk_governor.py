@@ -0,0 +1,129 @@
+import logging
+import shutil
+import time
+
+DEFAULT_EXTRACT_RATIO = 1.0     # bytes unpacked per archive byte, until measured on the archives of the run
+DEFAULT_ARCHIVE_BYTES = 10 * 1024 * 1024    # assumed size of an archive whose size is unknown, until sizes are measured
+POLL_SECONDS = 5                # how often free space is checked again while paused
+
+
+class DiskGovernor(object):
+    """
+    Keeps a download run within a budget of bytes downloaded and above a minimum of free disk space
+
+    Before each archive is downloaded (or taken from the archive cache) and unpacked, room is reserved for it, based on
+    its size on the server (or the mean archive size so far, if the server does not report it) and the ratio of unpacked
+    to archive bytes seen so far.  When free space runs low the run
+    pauses (up to pause_seconds) for space to be freed, then stops; when the budget would be exceeded it stops.
+    Archives are never started without room, so a stopped run leaves no partial files behind.
+    """
+
+    def __init__(self, path, max_download_bytes=0, min_free_bytes=0, pause_seconds=0):
+        self.path = path
+        self.max_download_bytes = max_download_bytes    # 0 means no budget
+        self.min_free_bytes = min_free_bytes            # 0 means free space is not checked
+        self.pause_seconds = pause_seconds
+        self.stats = {"downloaded": 0, "cached": 0, "extracted": 0, "archives": 0}
+        self.reserved_download = 0
+        self.reserved_disk = 0
+        self.stop_reason = ""
+
+    def is_limited(self):
+        """Returns true if a budget or minimum of free space is set, i.e. archive sizes are needed up front"""
+        return self.max_download_bytes > 0 or self.min_free_bytes > 0
+
+    def is_stopped(self):
+        return self.stop_reason != ""
+
+    def get_extract_ratio(self):
+        """Return bytes unpacked per archive byte so far (or the default, before anything was unpacked)"""
+        archive_bytes = self.stats["downloaded"] + self.stats["cached"]
+        if archive_bytes == 0 or self.stats["extracted"] == 0:
+            return DEFAULT_EXTRACT_RATIO
+        return self.stats["extracted"] / archive_bytes
+
+    def get_mean_archive_size(self):
+        """Return mean size of the archives so far (or the default, before any archive was retrieved)"""
+        if self.stats["archives"] == 0:
+            return DEFAULT_ARCHIVE_BYTES
+        return (self.stats["downloaded"] + self.stats["cached"]) // self.stats["archives"]
+
+    def estimate(self, archive_bytes, from_cache=False):
+        """Return (bytes to download, bytes of disk needed) for an archive, given its size (None if unknown)"""
+        if archive_bytes is None:
+            archive_bytes = self.get_mean_archive_size()
+        download_bytes = 0 if from_cache else archive_bytes
+        return download_bytes, download_bytes + int(archive_bytes * self.get_extract_ratio())
+
+    def reserve(self, archive_bytes, from_cache=False):
+        """
+        Wait (up to pause_seconds) until there is room for an archive, given its size (None if unknown)
+        Returns a reservation to pass to release once the archive is unpacked, or None if the run should stop
+        """
+        reservation = self.estimate(archive_bytes, from_cache)
+        waited = 0
+        while True:
+            status = self.__try_reserve(reservation, waited)
+            if status != "wait":
+                return reservation if status == "ok" else None
+            time.sleep(POLL_SECONDS)
+            waited += POLL_SECONDS
+
+    async def reserve_async(self, archive_bytes, from_cache=False):
+        """Same as reserve, for the asyncio download engine (other transfers go on while paused)"""
+        import asyncio
+
+        reservation = self.estimate(archive_bytes, from_cache)
+        waited = 0
+        while True:
+            status = self.__try_reserve(reservation, waited)
+            if status != "wait":
+                return reservation if status == "ok" else None
+            await asyncio.sleep(POLL_SECONDS)
+            waited += POLL_SECONDS
+
+    def __try_reserve(self, reservation, waited):
+        """Reserve room and return "ok", or return "wait" or "stop" """
+        if self.is_stopped():
+            return "stop"
+        download_bytes, disk_bytes = reservation
+        if self.max_download_bytes > 0 and \
+                self.stats["downloaded"] + self.reserved_download + download_bytes > self.max_download_bytes:
+            self.__stop("download budget of " + str(self.max_download_bytes) + " bytes reached")
+            return "stop"
+        # free space already includes partly written archives, so counting their reservations as well errs on the safe side
+        if self.min_free_bytes > 0 and \
+                shutil.disk_usage(self.path).free - self.reserved_disk - disk_bytes < self.min_free_bytes:
+            if waited >= self.pause_seconds:
+                self.__stop("less than " + str(self.min_free_bytes) + " bytes of free space left in " + self.path)
+                return "stop"
+            if waited == 0:
+                logging.warning('Low on free space in ' + self.path + ', pausing downloads')
+            return "wait"
+        self.reserved_download += download_bytes
+        self.reserved_disk += disk_bytes
+        return "ok"
+
+    def __stop(self, reason):
+        self.stop_reason = reason
+        logging.warning('Stopping downloads: ' + reason)
+
+    def cancel(self, reservation):
+        """Release the room reserved for an archive that was not retrieved"""
+        if reservation is not None:
+            self.reserved_download -= reservation[0]
+            self.reserved_disk -= reservation[1]
+
+    def release(self, reservation, archive_bytes, extracted_bytes, from_cache=False):
+        """Release the room reserved for an archive and count the bytes actually downloaded (or taken from the cache) and unpacked"""
+        self.cancel(reservation)
+        self.stats["cached" if from_cache else "downloaded"] += archive_bytes
+        self.stats["extracted"] += extracted_bytes
+        self.stats["archives"] += 1
+
+    def log_report(self):
+        """Log bytes downloaded, taken from the archive cache and unpacked, and why the run stopped early (if it did)"""
+        logging.info('Archives: ' + str(self.stats["archives"]) + ', bytes downloaded: ' + str(self.stats["downloaded"]) +
+                     ', from archive cache: ' + str(self.stats["cached"]) + ', extracted: ' + str(self.stats["extracted"]))
+        if self.is_stopped():
+            logging.warning('Downloads stopped early: ' + self.stop_reason)
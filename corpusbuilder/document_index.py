@@ -7,7 +7,10 @@ class DocumentIndex(object):
         self.accession_id_index = None
         self.file_url_index = None
         self.license_index = None
-        self.csv_dict = None
+        self.last_updated_index = None      # optional column
+        self.csv_dict = None                # eligible (i.e. license allowed) rows only
+        self.license_rejected_ids = None    # accession ids in the index with a license that is not allowed
+        self.license_list = config.licenses
         self.csv_file = csv_file
         self.config = config
         self.csv_file_read = None
@@ -26,14 +29,23 @@ class DocumentIndex(object):
         self.accession_id_index = header_list.index(self.config.accession_id_csvheader)
         self.file_url_index = header_list.index(self.config.file_url_csvheader)
         self.license_index = header_list.index(self.config.license_csvheader)
+        if self.config.last_updated_csvheader in header_list:
+            self.last_updated_index = header_list.index(self.config.last_updated_csvheader)
 
     def __create_in_memory_dic(self):
-        """Create an in-memory dictionary mapping PMC id to its metadata"""
+        """Create an in-memory dictionary mapping PMC id to its metadata, for PMC ids with an allowed license"""
         self.csv_dict = {}
+        self.license_rejected_ids = set()
+        licenses = set(self.license_list)
         for row in self.csv_file_read:
             if len(row) >= 5:
-                if row[self.accession_id_index] not in self.csv_dict:
-                    self.csv_dict[row[self.accession_id_index]] = row
+                accession_id = row[self.accession_id_index]
+                if accession_id in self.csv_dict or accession_id in self.license_rejected_ids:
+                    continue
+                if row[self.license_index] in licenses:
+                    self.csv_dict[accession_id] = row
+                else:
+                    self.license_rejected_ids.add(accession_id)
 
     @staticmethod
     def __separate_path_url(file_url):
@@ -45,14 +57,31 @@ class DocumentIndex(object):
         """
         Find metadata for a given PMCID
         :param accession_id: query accession_id
-        :return dict: {'result': True/False, 'ftp_file_path': 'ftp_file_path', 'file_name': 'file_name', 'pmc_id': 'pmc_id'}
+        :return dict: {'result': True/False, 'ftp_file_path': 'ftp_file_path', 'file_name': 'file_name', 'pmc_id': 'pmc_id', ...}
         """
-        license_list = ['CC BY', 'CC0']
         if accession_id in self.csv_dict:
-            pmc_row = self.csv_dict[accession_id]
-            if pmc_row[self.license_index] in license_list:
-                file_path, file_name = self.__separate_path_url(pmc_row[self.file_url_index])
-                return {'result': True, 'ftp_file_path': file_path, 'file_name': file_name, 'pmc_id': accession_id, "pmc_license": pmc_row[self.license_index]}
+            return self.__get_row_metadata(accession_id, self.csv_dict[accession_id])
 
-        return {'result': False, 'ftp_file_path': None, 'file_name': None, 'pmc_id': accession_id, "pmc_license": None}
+        return {'result': False, 'ftp_file_path': None, 'file_name': None, 'pmc_id': accession_id, "pmc_license": None, "last_updated": None}
+
+    def get_metadata_many(self, accession_ids: list) -> list:
+        """
+        Find metadata for many PMCIDs at once, skipping PMCIDs that are not in the index or have a license that is not allowed
+        :param accession_ids: query accession_ids
+        :return list: [{'result': True, 'ftp_file_path': 'ftp_file_path', 'file_name': 'file_name', 'pmc_id': 'pmc_id'}, ...]
+        """
+        csv_dict = self.csv_dict
+        return [self.__get_row_metadata(accession_id, csv_dict[accession_id])
+                for accession_id in dict.fromkeys(accession_ids) if accession_id in csv_dict]
+
+    def get_license_rejected(self, accession_ids: list) -> list:
+        """Return the given PMCIDs that are in the index but have a license that is not allowed"""
+        return [accession_id for accession_id in dict.fromkeys(accession_ids) if accession_id in self.license_rejected_ids]
+
+    def __get_row_metadata(self, accession_id, pmc_row):
+        """Return metadata dict for an eligible row of the index"""
+        file_path, file_name = self.__separate_path_url(pmc_row[self.file_url_index])
+        last_updated = pmc_row[self.last_updated_index] if self.last_updated_index is not None else ""
+        return {'result': True, 'ftp_file_path': file_path, 'file_name': file_name, 'pmc_id': accession_id,
+                "pmc_license": pmc_row[self.license_index], "last_updated": last_updated}
 
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import re
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from corpusbuilder.corpus_builder import CorpusBuilder
+from corpusbuilder.affiliation_resolver import AffiliationResolver
+from corpusbuilder.image_store import ImageStore
+from corpusbuilder.query_index import QueryIndex
+from corpusbuilder.sidecar import spill_large_fields
+from corpusbuilder.helper import *
+
+PMC_ID_REGEX = re.compile(r"^PMC\d+$")
+
+
+class ExtractionEngine(object):
+    """
+    Holds everything needed to extract JSON from NXML files (spaCy model, country list, image store, query index and
+    extraction settings from the config), so that it is set up once and reused for many articles
+
+    Used by extract_corpus.py for a batch, or by ExtractionServer to serve extraction requests from a warm process.
+    """
+
+    def __init__(self, config, document_index=None):
+        self.config = config
+        self.document_index = document_index    # to look up licenses of articles extracted by path only
+
+        # spacy model is loaded on first use, i.e. only when an unstructured affiliation needs NER (or on warm_up)
+        self.spacy_model = LazySpacyModel(config.spacy_model)
+        self.nlp = self.spacy_model
+        if config.affiliation_ner != "spacy":
+            self.nlp = AffiliationResolver(self.spacy_model, config.affiliation_ner, config.affiliation_ner_min_confidence)
+
+        # character references (e.g. &#x000a0;) replaced when reading NXML files
+        self.entity_replacements = ENTITY_REPLACEMENT_SETS[config.entity_replacements]
+
+        # figure files point to the canonical copy of each image, if an image store is configured
+        self.image_store = None
+        if config.image_store_dir:
+            self.image_store = ImageStore(config.image_store_dir)
+
+        # extracted articles are added to the query index as they are written
+        self.query_index = None
+        if config.query_index_file:
+            self.query_index = QueryIndex(config.query_index_file)
+
+        self.max_peak_memory = 0
+
+    def warm_up(self):
+        """Load the spaCy model and country list now, rather than on the first article that needs them"""
+        if self.config.affiliation_ner != "rules":
+            self.spacy_model.load()
+        CorpusBuilder.get_countries()
+
+    def extract(self, pmc_id, nxml_file, license, image_files):
+        """Return extract JSON of an NXML file, given its PMCID, license and the image files of its article"""
+        if not self.config.report_peak_memory:
+            return CorpusBuilder.populate_template(self.nlp, pmc_id, nxml_file, license, image_files,
+                                                   self.config.bounded_memory, self.image_store, self.entity_replacements)
+        extract_json, peak_memory = measure_peak_memory(CorpusBuilder.populate_template, self.nlp, pmc_id, nxml_file,
+                                                        license, image_files, self.config.bounded_memory,
+                                                        self.image_store, self.entity_replacements)
+        logging.info('Peak memory for ' + str(pmc_id) + ': ' + str(peak_memory) + ' bytes')
+        self.max_peak_memory = max(self.max_peak_memory, peak_memory)
+        return extract_json
+
+    def extract_path(self, nxml_file, pmc_id=None, license=None):
+        """
+        Return extract JSON of an NXML file given only its path, as in the corpus download directory
+        (PMCID defaults to the name of its folder, license to the one in the document index, images are those in its folder)
+        """
+        article_dir = os.path.dirname(nxml_file)
+        if pmc_id is None:
+            pmc_id = os.path.basename(os.path.abspath(article_dir))
+        if license is None:
+            license = ""
+            if self.document_index is not None:
+                license = self.document_index.get_metadata(pmc_id)['pmc_license']
+        image_files = replace_slashes(get_file_paths(IMAGE_FILE_EXTENSIONS, article_dir))
+        return self.extract(pmc_id, nxml_file, license, image_files)
+
+    def write(self, extract_json):
+        """Write extract JSON (and its sidecar files) to the article's folder in the corpus extract directory, and index it"""
+        pmc_id = extract_json['pmc_id']
+        corpus_extract_subdir = self.config.corpus_extract_dir + pmc_id
+        create_dir(corpus_extract_subdir)
+        if self.config.sidecar_threshold_bytes > 0:
+            spill_large_fields(extract_json, corpus_extract_subdir, self.config.sidecar_threshold_bytes)
+        write_json(corpus_extract_subdir, pmc_id, extract_json)
+        if self.query_index is not None:
+            self.query_index.add(extract_json, corpus_extract_subdir)
+
+    def log_stats(self):
+        if self.query_index is not None:
+            logging.info('Query index ' + self.config.query_index_file + ': ' + str(self.query_index.get_count()) + ' articles')
+        if self.config.report_peak_memory:
+            logging.info('Highest peak memory for a single document: ' + str(self.max_peak_memory) + ' bytes')
+        if isinstance(self.nlp, AffiliationResolver):
+            self.nlp.log_stats()
+
+    def close(self):
+        if self.query_index is not None:
+            self.query_index.close()
+
+
+class ExtractionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles requests to ExtractionServer:
+    POST /extract with JSON {"nxml_file": path, "pmc_id": optional, "license": optional, "write": optional boolean}
+    returns the extract JSON, GET /status returns number of requests served
+
+    Only NXML files under the corpus download directory are read, and the PMCID (given, or the name of the NXML file's
+    folder) must look like PMC<digits>, as it names the folder written to in the corpus extract directory.
+    """
+
+    def do_GET(self):
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        self.__send_json(200, {"num_extracted": self.server.num_extracted, "num_failed": self.server.num_failed})
+
+    def do_POST(self):
+        if self.path != "/extract":
+            self.send_error(404)
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.__send_json(415, {"error": "Expected Content-Type: application/json"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            nxml_file = request["nxml_file"]
+            pmc_id = request.get("pmc_id") or os.path.basename(os.path.dirname(os.path.abspath(nxml_file)))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.__send_json(400, {"error": "Expected JSON with nxml_file"})
+            return
+        if not isinstance(pmc_id, str) or not PMC_ID_REGEX.fullmatch(pmc_id):
+            self.__send_json(400, {"error": "Invalid PMCID: " + str(pmc_id)})
+            return
+        if not self.__is_in_download_dir(nxml_file):
+            self.__send_json(403, {"error": "Not in the corpus download directory: " + nxml_file})
+            return
+        if not os.path.isfile(nxml_file):
+            self.__send_json(404, {"error": "No such file: " + nxml_file})
+            return
+
+        try:
+            extract_json = self.server.engine.extract_path(nxml_file, pmc_id, request.get("license"))
+            if request.get("write", False):
+                self.server.engine.write(extract_json)
+        except Exception as exception:
+            logging.exception('Failed to extract JSON from ' + nxml_file)
+            self.server.num_failed += 1
+            self.__send_json(500, {"error": str(exception)})
+            return
+        self.server.num_extracted += 1
+        self.__send_json(200, extract_json)
+
+    def __is_in_download_dir(self, path):
+        download_dir = os.path.realpath(self.server.engine.config.corpus_download_dir)
+        try:
+            return os.path.commonpath([download_dir, os.path.realpath(path)]) == download_dir
+        except ValueError:  # on another drive
+            return False
+
+    def __send_json(self, status, output_json):
+        body = json.dumps(output_json).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug('Extraction server: ' + format % args)
+
+
+class ExtractionServer(HTTPServer):
+    """
+    HTTP server (meant to listen on localhost) extracting JSON from NXML files with a warm ExtractionEngine
+
+    Requests are served one at a time, as the engine (spaCy model, image store, query index) is shared.
+    """
+
+    def __init__(self, engine, host="127.0.0.1", port=8765):
+        super().__init__((host, port), ExtractionRequestHandler)
+        self.engine = engine
+        self.num_extracted = 0
+        self.num_failed = 0
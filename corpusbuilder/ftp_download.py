@@ -1,4 +1,3 @@
-import pycurl
 import logging
 from corpusbuilder.helper import *
 
@@ -6,10 +5,11 @@ class FTPDownload(object):
 
     index_file_local = ""
 
-    def __init__(self, config):
+    def __init__(self, config, archive_cache=None):
         self.file = None
         self.pbar = None
         self.config = config
+        self.archive_cache = archive_cache
 
 
     def get_index_file(self):
@@ -26,27 +26,76 @@ class FTPDownload(object):
         return self.index_file_local
 
 
-    def download_ftp_file(self, path, file_name):
-        """Download a file via FTP"""
+    def get_remote_file_size(self, path, file_name):
+        """Return size in bytes of a file on the PMC server, without downloading it (FTP SIZE / HTTP HEAD), or None if unknown"""
+        import pycurl
+
+        try:
+            curl = pycurl.Curl()
+            curl.setopt(pycurl.PROXYTYPE, pycurl.PROXYTYPE_HTTP)
+            curl.setopt(pycurl.PROXY, self.config.proxy)            # set proxy
+            curl.setopt(pycurl.URL, self.config.pubmed_ftp_server + '/' + path + '/' + file_name)
+            curl.setopt(pycurl.NOBODY, 1)
+            curl.perform()
+            size = curl.getinfo(pycurl.CONTENT_LENGTH_DOWNLOAD)
+            curl.close()
+        except Exception as e:
+            logging.exception("Error getting size of " + file_name)
+            return None
+        return int(size) if size >= 0 else None
+
+    def download_ftp_file(self, path, file_name, cache_key=None, try_cache=True):
+        """
+        Download a file via FTP (or get it from the archive cache, if given a cache key), return true if it came from the cache
+        With try_cache false the cache is not looked up (e.g. the caller already did), but the download is still added to it
+        """
         
         # if folder doesn't exist, create it
         create_dir(self.config.corpus_download_dir)
 
-        # download the file
-        try:
-            output_file = self.config.corpus_download_dir + file_name
+        # use cached copy, if available
+        output_file = self.config.corpus_download_dir + file_name
+        if self.archive_cache is not None and cache_key is not None and try_cache:
+            if self.archive_cache.fetch(cache_key, output_file):
+                return True
+
+        # remove an old copy first, as it may be a link to a cached archive
+        if os.path.exists(output_file):
+            os.remove(output_file)
 
+        # pycurl is only needed once something is actually downloaded
+        import pycurl
+
+        # download the file to a partial file, which only gets the final name once complete and verified
+        partial_file = output_file + PARTIAL_FILE_SUFFIX
+        try:
             curl=pycurl.Curl()
             curl.setopt(pycurl.PROXYTYPE, pycurl.PROXYTYPE_HTTP)
             curl.setopt(pycurl.PROXY, self.config.proxy)            # set proxy
+            curl.setopt(pycurl.FAILONERROR, True)                   # no error pages saved as archives
 
             pmc_url = self.config.pubmed_ftp_server + '/' + path + '/' + file_name
             curl.setopt(pycurl.URL, pmc_url)
 
-            fp = open(output_file, 'wb')
-            curl.setopt(pycurl.WRITEDATA, fp)
-            curl.perform()
+            with open(partial_file, 'wb') as fp:
+                curl.setopt(pycurl.WRITEDATA, fp)
+                curl.perform()
+            expected_size = curl.getinfo(pycurl.CONTENT_LENGTH_DOWNLOAD)
             curl.close()
-            fp.close()
+
+            error = ""
+            if expected_size >= 0 and os.path.getsize(partial_file) != expected_size:
+                error = "got " + str(os.path.getsize(partial_file)) + " of " + str(int(expected_size)) + " bytes"
+            elif file_name.endswith(".tar.gz"):
+                error = get_tar_file_error(partial_file)
+            if error != "":
+                raise IOError("Incomplete or corrupt download of " + pmc_url + ": " + error)
+            os.replace(partial_file, output_file)
+
+            if self.archive_cache is not None and cache_key is not None:
+                self.archive_cache.store(cache_key, output_file)
         except Exception as e:
             logging.exception("Error downloading PMC paper archive")
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+        return False
@@ -1,9 +1,22 @@
 import tarfile
+import gzip
+import hashlib
 import json
 import os
+import shutil
 import uuid
 import logging
-from bs4 import BeautifulSoup as bs4
+import re
+import tracemalloc
+
+# file extensions of images in PMC article packages
+IMAGE_FILE_EXTENSIONS = ["gif", "jpeg", "jpg", "png", "tif", "tiff", "bmp", "eps"]
+
+# files are written under this suffix and renamed once complete, so a leftover one marks an interrupted write
+PARTIAL_FILE_SUFFIX = ".part"
+
+# block size for reading archives when verifying them
+VERIFY_CHUNK_SIZE = 1024 * 1024
 
 def has_nxml_file(files):
     """Returns true if the given file list contains an .nxml file"""
@@ -21,24 +34,133 @@ def create_dir(path):
         logging.exception("Error creating directory " + path)
         exit(0)
 
-def extract_tar_file(output_path, tar_input_file):
-    """Unpack the PMC tar.gz archive and delete the file"""
+def extract_tar_file(output_path, tar_input_file, image_store=None):
+    """
+    Unpack the PMC tar.gz archive and delete the file, adding unpacked images to the image store (if given)
+    Returns number of bytes unpacked
+    """
+    extracted_bytes = 0
     if os.path.exists(tar_input_file):
         if tarfile.is_tarfile(tar_input_file):
             try:
                 file = tarfile.open(tar_input_file, "r:gz")
+                # unlink files of an earlier extraction first, as they may be hard links into the image store,
+                # which extractall would otherwise overwrite in place
+                for member in file.getmembers():
+                    target_path = os.path.join(output_path, member.name)
+                    if not member.isdir() and os.path.lexists(target_path) and not os.path.isdir(target_path):
+                        os.remove(target_path)
                 file.extractall(output_path)
+                for member in file.getmembers():
+                    if member.isfile():
+                        extracted_bytes += member.size
+                        if image_store is not None and is_image_file(member.name):
+                            image_store.add(os.path.join(output_path, member.name))
                 file.close()
             except Exception as e:
                 logging.exception("Error during unpacking the archive")
             # delete the archive file
             os.remove(tar_input_file)
+    return extracted_bytes
+
+def is_image_file(file_name):
+    """Returns true if the file name has an image file extension"""
+    return os.path.splitext(file_name)[1][1:].lower() in IMAGE_FILE_EXTENSIONS
+
+def get_tar_file_error(tar_file):
+    """
+    Return why a tar.gz archive is corrupt or incomplete, or "" if it is sound
+    Every member is read in full and the gzip stream up to its trailer, so truncated archives are caught even where
+    tarfile.is_tarfile accepts them
+    """
+    try:
+        with gzip.open(tar_file, 'rb') as gzip_file:
+            with tarfile.open(fileobj=gzip_file, mode="r:") as archive:
+                num_members = 0
+                for member in archive:
+                    num_members += 1
+                    if member.isfile():
+                        member_file = archive.extractfile(member)
+                        num_bytes = 0
+                        while True:
+                            chunk = member_file.read(VERIFY_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            num_bytes += len(chunk)
+                        if num_bytes != member.size:
+                            return "member " + member.name + " is truncated"
+                if num_members == 0:
+                    return "archive is empty"
+            # read to the end of the gzip stream, which checks its length and CRC
+            while gzip_file.read(VERIFY_CHUNK_SIZE):
+                pass
+    except (OSError, EOFError, tarfile.TarError, ValueError) as error:
+        return str(error) if str(error) else type(error).__name__
+    return ""
+
+def hash_file(file_path):
+    """Return sha256 hex digest of a file's content"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(VERIFY_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def link_or_copy(src, dst):
+    """Replace dst with a hard link to src (or a copy, if linking is not possible); return true if linked"""
+    tmp_dst = dst + PARTIAL_FILE_SUFFIX
+    linked = True
+    try:
+        os.link(src, tmp_dst)
+    except OSError:
+        shutil.copy2(src, tmp_dst)
+        linked = False
+    os.replace(tmp_dst, dst)
+    return linked
 
 def write_json(path, file_name, output_json):
-    """Write generated JSON, given path, file_name and JSON blob """   
+    """Write generated JSON, given path, file_name and JSON blob (to a partial file first, so it is never left half written)"""
     json_file_path = path + "/" + file_name + ".json"
-    with open(json_file_path, 'w') as file:
+    with open(json_file_path + PARTIAL_FILE_SUFFIX, 'w') as file:
         file.write(json.dumps(output_json))
+    os.replace(json_file_path + PARTIAL_FILE_SUFFIX, json_file_path)
+
+def read_query_file(path):
+    """Return list of search term strings in a query file (one per line, blank lines and lines starting with '#' skipped)"""
+    with open(path, 'r', encoding='utf-8') as file:
+        lines = [line.strip() for line in file]
+    return [line for line in lines if line != "" and not line.startswith("#")]
+
+def read_pmcid_file(path):
+    """Return list of PMCIDs (e.g. PMC123) in a verify report written by verify_corpus.py (its pmc_ids)"""
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)["pmc_ids"]
+
+def parse_shard(shard):
+    """Return (shard index, number of shards), given string 'i/N' with 0 <= i < N"""
+    shard_index, num_shards = [int(part) for part in shard.split("/")]
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError("Invalid shard " + shard + ", expected i/N with 0 <= i < N")
+    return shard_index, num_shards
+
+def get_shard(pmc_id, num_shards):
+    """Return shard index of a PMCID, using a hash that is stable across hosts and runs"""
+    return int(hashlib.md5(pmc_id.encode('utf-8')).hexdigest(), 16) % num_shards
+
+def merge_run_reports(path):
+    """Combine the run reports (run-report-*.json) in a folder into a single report, write it to run-report.json and return it"""
+    merged_report = {"num_processed": 0, "num_failed": 0, "processed": [], "failed": [], "reports": []}
+    for file in sorted(os.listdir(path)):
+        if file.startswith("run-report-") and file.endswith(".json"):
+            with open(os.path.join(path, file), 'r') as report_file:
+                report = json.loads(report_file.read())
+            merged_report["num_processed"] += report["num_processed"]
+            merged_report["num_failed"] += report["num_failed"]
+            merged_report["processed"].extend(report["processed"])
+            merged_report["failed"].extend(report["failed"])
+            merged_report["reports"].append(file)
+    write_json(path, "run-report", merged_report)
+    return merged_report
 
 def get_file_name_from_path(file):
     """Return file name from path, given path"""
@@ -89,9 +211,52 @@ def check_empty_tag(tag):
         return ""
     return str(tag)
 
-def replace_encodings(string):
-    """Return string with some encodings replaced"""
-    return string.replace("&#x000a0;", " ").replace("&#x02212;", "-")
+def get_text_excluding_tags(element, excluded_tags):
+    """Return text of an HTML element, skipping the child tags with the given names (and everything inside them)"""
+    from bs4.element import NavigableString, CData
+    string_types = getattr(element, 'interesting_string_types', (NavigableString, CData))
+    text = []
+
+    def collect(tag):
+        for child in tag.children:
+            if child.name is None:
+                if type(child) in string_types:
+                    text.append(child)
+            elif child.name not in excluded_tags:
+                collect(child)
+
+    collect(element)
+    return "".join(text)
+
+# replacements of numeric character references (e.g. &#x000a0;, &#xa0; or &#160;) in NXML, by code point
+ENTITY_REPLACEMENTS = {
+    0x00a0: " ",    # no-break space
+    0x2212: "-",    # minus sign
+}
+
+# default replacements plus other space and hyphen variants
+EXTENDED_ENTITY_REPLACEMENTS = dict(ENTITY_REPLACEMENTS)
+EXTENDED_ENTITY_REPLACEMENTS.update({
+    0x2002: " ", 0x2003: " ", 0x2004: " ", 0x2005: " ", 0x2006: " ", 0x2007: " ", 0x2008: " ",
+    0x2009: " ", 0x200a: " ", 0x202f: " ", 0x205f: " ",    # en/em/thin/hair/narrow spaces
+    0x2010: "-", 0x2011: "-", 0x2012: "-",                   # hyphen, non-breaking hyphen, figure dash
+    0xfe63: "-", 0xff0d: "-",                                 # small and fullwidth hyphen-minus
+})
+
+ENTITY_REPLACEMENT_SETS = {"default": ENTITY_REPLACEMENTS, "extended": EXTENDED_ENTITY_REPLACEMENTS}
+
+CHARACTER_REFERENCE_REGEX = re.compile(r"&#(?:[xX]([0-9a-fA-F]+)|([0-9]+));")
+
+def replace_encodings(string, replacements=None):
+    """Return string with some encodings replaced (ENTITY_REPLACEMENTS, unless given other replacements), in a single pass"""
+    if replacements is None:
+        replacements = ENTITY_REPLACEMENTS
+
+    def replace(match):
+        code_point = int(match.group(1), 16) if match.group(1) is not None else int(match.group(2))
+        return replacements.get(code_point, match.group(0))
+
+    return CHARACTER_REFERENCE_REGEX.sub(replace, string)
 
 def get_file_paths(file_extension_list, path):
     """Return list of files in a directory, given list of file extensions and path to directory"""
@@ -113,4 +278,42 @@ def gen_dict_extract(var, key):
                 yield from gen_dict_extract(v, key)
     elif isinstance(var, list):
         for d in var:
-            yield from gen_dict_extract(d, key)
\ No newline at end of file
+            yield from gen_dict_extract(d, key)
+
+def measure_peak_memory(func, *args, **kwargs):
+    """
+    Call func with the given arguments, return its result and the peak memory (bytes) allocated by Python during the call
+    If tracemalloc is already tracing (e.g. for a profiler) it is left running; its peak is reset for the call
+    (on Python < 3.9, which cannot reset it, the peak since tracing started is returned)
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    try:
+        result = func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return result, peak
+
+
+class LazySpacyModel(object):
+    """Stands in for a spaCy pipeline and only loads the model the first time text is passed to it"""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.nlp = None
+
+    def __call__(self, text):
+        return self.load()(text)
+
+    def load(self):
+        """Load the model now (if not loaded yet) and return it"""
+        if self.nlp is None:
+            import spacy
+            logging.info('Loading spaCy model: ' + self.model_name)
+            self.nlp = spacy.load(self.model_name)
+        return self.nlp
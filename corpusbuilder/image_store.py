@@ -0,0 +1,68 @@
+import logging
+import os
+import stat
+from corpusbuilder.helper import create_dir, hash_file, link_or_copy
+
+
+class ImageStore(object):
+    """A content-addressed store of image files shared across the corpus: each distinct image is stored once and hard-linked from each article"""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.num_files = 0          # image files added
+        self.num_duplicates = 0     # image files whose content was already in the store
+        self.bytes_saved = 0        # bytes no longer stored twice, thanks to hard links
+        self.inode_index = {}       # (device, inode) -> canonical path, of the copies added or looked up by this process
+        create_dir(self.store_dir)
+
+    @staticmethod
+    def hash_file(file_path):
+        """Return sha256 hex digest of a file's content"""
+        return hash_file(file_path)
+
+    def get_blob_path(self, file_hash, extension):
+        """Return path of the canonical copy of an image, given its hash and file extension"""
+        return os.path.join(self.store_dir, file_hash[:2], file_hash + extension.lower())
+
+    def add(self, file_path):
+        """Add an image file to the store, replacing duplicates with a hard link to the canonical copy; return canonical path"""
+        blob_path = self.get_blob_path(self.hash_file(file_path), os.path.splitext(file_path)[1])
+        self.num_files += 1
+
+        if not os.path.exists(blob_path):
+            create_dir(os.path.dirname(blob_path))
+            link_or_copy(file_path, blob_path)
+            # canonical copies are read-only, so that nothing writes through a hard link into the store
+            os.chmod(blob_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        elif not os.path.samefile(blob_path, file_path):
+            self.num_duplicates += 1
+            file_size = os.path.getsize(file_path)
+            if link_or_copy(blob_path, file_path):
+                self.bytes_saved += file_size
+        self.__index(blob_path)
+        return blob_path
+
+    def __index(self, blob_path):
+        # canonical copies are never removed, so their inode numbers are not reused for other files
+        blob_stat = os.stat(blob_path)
+        self.inode_index[(blob_stat.st_dev, blob_stat.st_ino)] = blob_path
+
+    def get_canonical_path(self, file_path):
+        """
+        Return path of the canonical copy of an image file, or the file path itself if its content is not in the store
+        (files hard-linked to a copy already added or looked up are found by inode, others are hashed)
+        """
+        file_stat = os.stat(file_path)
+        blob_path = self.inode_index.get((file_stat.st_dev, file_stat.st_ino))
+        if blob_path is not None:
+            return blob_path
+        blob_path = self.get_blob_path(self.hash_file(file_path), os.path.splitext(file_path)[1])
+        if not os.path.exists(blob_path):
+            return file_path
+        self.__index(blob_path)
+        return blob_path
+
+    def log_report(self):
+        """Log how many image files were added and how much space deduplication saved"""
+        logging.info('Image store ' + self.store_dir + ': ' + str(self.num_files) + ' images added, ' +
+                     str(self.num_duplicates) + ' duplicates, ' + str(self.bytes_saved) + ' bytes saved')
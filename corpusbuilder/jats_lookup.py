@@ -0,0 +1,28 @@
+# JATS elements needed by the CorpusBuilder getters
+LOOKUP_TAGS = ['title-group', 'journal-meta', 'journal-title-group', 'article-meta', 'contrib', 'aff', 'pub-date',
+               'funding-group', 'grant-num', 'fig', 'table-wrap']
+
+
+class JatsLookup(object):
+    """Locates the JATS elements needed by the CorpusBuilder getters in a single pass over the soup; pass it to the getters in place of the soup"""
+
+    def __init__(self, soup, tags=None):
+        self.soup = soup
+        self.elements = {tag: [] for tag in (tags if tags is not None else LOOKUP_TAGS)}
+        for element in soup.descendants:
+            elements = self.elements.get(element.name)     # name is None for strings
+            if elements is not None:
+                elements.append(element)
+
+    def find(self, name):
+        """Return first element with the given tag name (or None), like soup.find"""
+        if name in self.elements:
+            elements = self.elements[name]
+            return elements[0] if len(elements) > 0 else None
+        return self.soup.find(name)
+
+    def find_all(self, name):
+        """Return all elements with the given tag name, in document order, like soup.find_all"""
+        if name in self.elements:
+            return self.elements[name]
+        return self.soup.find_all(name)
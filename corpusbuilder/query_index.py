@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+
+from corpusbuilder.sidecar import load_sidecar
+
+# sections of the extract JSON indexed as records, with the kind stored for them and the field holding their caption
+RECORD_SECTIONS = {"html_tables": ("html_table", "table_caption"),
+                   "image_tables": ("image_table", "table_caption"),
+                   "figures": ("figure", "caption")}
+
+# record kinds returned for each value of the records argument of QueryIndex.query
+RECORD_KINDS = {"tables": ["html_table", "image_table"],
+                "figures": ["figure"],
+                "all": ["html_table", "image_table", "figure"]}
+
+TAG_REGEX = re.compile(r"<[^>]+>")
+
+
+def quote_fts_terms(text):
+    """Return FTS5 query matching all whitespace-separated terms of text, each quoted so it is not read as FTS5 syntax"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split()) or '""'
+
+
+def get_caption_text(caption):
+    """Return plain text of a caption (JATS/HTML markup removed)"""
+    return " ".join(TAG_REGEX.sub(" ", caption).split())
+
+
+class QueryIndex(object):
+    """
+    A SQLite index of the extracted JSON files, for finding articles and table/figure records without loading the JSON
+
+    Indexes pmc_id, authors, affiliation countries, journal, publication year, license and caption text.
+    Captions are searched with FTS5 if the SQLite library supports it, else with LIKE.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS articles (pmc_id TEXT PRIMARY KEY, article_title TEXT, "
+                                "journal TEXT COLLATE NOCASE, year INTEGER, license TEXT COLLATE NOCASE, json_file TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS authors (pmc_id TEXT, name TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS countries (pmc_id TEXT, country TEXT COLLATE NOCASE)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, pmc_id TEXT, kind TEXT, "
+                                "record_id TEXT, caption TEXT)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS articles_journal ON articles (journal)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS articles_year ON articles (year)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS authors_pmc_id ON authors (pmc_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS countries_country ON countries (country, pmc_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS countries_pmc_id ON countries (pmc_id)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS records_pmc_id ON records (pmc_id)")
+        try:
+            self.connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS captions USING fts5(caption)")
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+
+    def add(self, extract_json, json_dir):
+        """Add (or replace) an article, given its extract JSON and the folder it was written to"""
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.__add(extract_json, json_dir)
+
+    def __add(self, extract_json, json_dir):
+        pmc_id = extract_json['pmc_id']
+        self.__remove(pmc_id)
+
+        metadata = extract_json['metadata']
+        provenance = metadata['provenance']
+        year = provenance['publication_date'].get('year')
+        self.connection.execute("INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?)",
+                                (pmc_id, metadata['article_title'], provenance['publisher'].get('journal_name', ''),
+                                 year if isinstance(year, int) else None, metadata['license'],
+                                 os.path.join(json_dir, pmc_id + ".json")))
+
+        countries = set()
+        for author in provenance['authors']:
+            self.connection.execute("INSERT INTO authors VALUES (?, ?)",
+                                    (pmc_id, author['given_names'] + " " + author['surname']))
+            countries.update(affiliation['country'] for affiliation in author['affiliations'] if affiliation['country'])
+        self.connection.executemany("INSERT INTO countries VALUES (?, ?)", [(pmc_id, country) for country in countries])
+
+        for section, (kind, caption_field) in RECORD_SECTIONS.items():
+            for record in extract_json.get(section, []):
+                caption = get_caption_text(load_sidecar(record.get(caption_field, ""), json_dir))
+                cursor = self.connection.execute("INSERT INTO records (pmc_id, kind, record_id, caption) VALUES (?, ?, ?, ?)",
+                                                 (pmc_id, kind, record['id'], caption))
+                if self.has_fts:
+                    self.connection.execute("INSERT INTO captions (rowid, caption) VALUES (?, ?)", (cursor.lastrowid, caption))
+
+    def __remove(self, pmc_id):
+        if self.has_fts:
+            self.connection.execute("DELETE FROM captions WHERE rowid IN (SELECT id FROM records WHERE pmc_id = ?)", (pmc_id,))
+        for table in ["articles", "authors", "countries", "records"]:
+            self.connection.execute("DELETE FROM " + table + " WHERE pmc_id = ?", (pmc_id,))
+
+    def rebuild(self, corpus_extract_dir):
+        """Drop the index contents and index all article JSON files in the corpus extract directory, return number indexed"""
+        num_indexed = 0
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            for table in ["articles", "authors", "countries", "records"] + (["captions"] if self.has_fts else []):
+                self.connection.execute("DELETE FROM " + table)
+            for entry in sorted(os.listdir(corpus_extract_dir)):
+                json_dir = os.path.join(corpus_extract_dir, entry)
+                json_file_path = os.path.join(json_dir, entry + ".json")
+                if not os.path.isfile(json_file_path):
+                    continue
+                try:
+                    with open(json_file_path, 'r') as file:
+                        self.__add(json.load(file), json_dir)
+                    num_indexed += 1
+                except (ValueError, KeyError):
+                    logging.exception('Could not index ' + json_file_path)
+        return num_indexed
+
+    def query(self, journal=None, year=None, country=None, author=None, license=None, caption=None, records=None,
+              fts_syntax=False):
+        """
+        Return sorted PMCIDs of articles matching all given filters, or if records is tables, figures or all,
+        dicts (pmc_id, kind, id, caption) of matching records of that kind
+
+        journal, country and license match case-insensitively, author matches part of "given names surname",
+        caption matches records containing all its terms (e.g. 'COVID-19 IL-6') if FTS5 is available, else it is a substring;
+        with fts_syntax, caption is passed to FTS5 as a query (e.g. 'vaccine AND efficacy'), which raises sqlite3.OperationalError
+        if it is not valid FTS5 syntax
+        """
+        conditions = []
+        parameters = []
+        if journal is not None:
+            conditions.append("a.journal = ?")
+            parameters.append(journal)
+        if year is not None:
+            conditions.append("a.year = ?")
+            parameters.append(int(year))
+        if license is not None:
+            conditions.append("a.license = ?")
+            parameters.append(license)
+        if country is not None:
+            conditions.append("a.pmc_id IN (SELECT pmc_id FROM countries WHERE country = ?)")
+            parameters.append(country)
+        if author is not None:
+            conditions.append("a.pmc_id IN (SELECT pmc_id FROM authors WHERE name LIKE ?)")
+            parameters.append("%" + author + "%")
+
+        if records is None:
+            if caption is not None:
+                conditions.append("a.pmc_id IN (SELECT pmc_id FROM records r WHERE " + self.__caption_condition() + ")")
+                parameters.append(self.__caption_parameter(caption, fts_syntax))
+            sql = "SELECT a.pmc_id FROM articles a" + self.__where(conditions) + " ORDER BY a.pmc_id"
+            return [row[0] for row in self.connection.execute(sql, parameters)]
+
+        if records not in RECORD_KINDS:
+            raise ValueError("Unknown record kind: " + str(records))
+        kinds = RECORD_KINDS[records]
+        conditions.append("r.kind IN (" + ", ".join("?" * len(kinds)) + ")")
+        parameters.extend(kinds)
+        if caption is not None:
+            conditions.append(self.__caption_condition())
+            parameters.append(self.__caption_parameter(caption, fts_syntax))
+        sql = ("SELECT r.pmc_id, r.kind, r.record_id, r.caption FROM records r JOIN articles a ON a.pmc_id = r.pmc_id" +
+               self.__where(conditions) + " ORDER BY r.pmc_id, r.id")
+        return [{"pmc_id": row[0], "kind": row[1], "id": row[2], "caption": row[3]}
+                for row in self.connection.execute(sql, parameters)]
+
+    def __caption_condition(self):
+        if self.has_fts:
+            return "r.id IN (SELECT rowid FROM captions WHERE captions MATCH ?)"
+        return "r.caption LIKE ?"
+
+    def __caption_parameter(self, caption, fts_syntax):
+        if not self.has_fts:
+            return "%" + caption + "%"
+        return caption if fts_syntax else quote_fts_terms(caption)
+
+    @staticmethod
+    def __where(conditions):
+        return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    def get_count(self):
+        """Return number of articles in the index"""
+        return self.connection.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
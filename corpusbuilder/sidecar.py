@@ -0,0 +1,52 @@
+import gzip
+import hashlib
+import os
+
+from corpusbuilder.helper import PARTIAL_FILE_SUFFIX
+
+# fields of the extract JSON that may be moved to sidecar files, by section
+SIDECAR_FIELDS = {"html_tables": ["table_html", "table_caption"],
+                  "image_tables": ["table_caption"],
+                  "figures": ["caption"]}
+
+
+def spill_large_fields(extract_json, path, threshold):
+    """
+    Move table HTML and captions larger than threshold bytes to gzip sidecar files in path (next to the JSON file)
+    Each moved field is replaced by a reference: {"sidecar": file name, "bytes": length of the UTF-8 text, "sha256": hash of it}
+    Returns number of fields moved
+    """
+    num_spilled = 0
+    for section, fields in SIDECAR_FIELDS.items():
+        for index, entry in enumerate(extract_json.get(section, [])):
+            for field in fields:
+                value = entry.get(field)
+                if not isinstance(value, str):
+                    continue
+                data = value.encode('utf-8')
+                if len(data) <= threshold:
+                    continue
+                file_name = extract_json['pmc_id'] + "." + section + "-" + str(index) + "." + field + ".gz"
+                tmp_file_path = os.path.join(path, file_name + PARTIAL_FILE_SUFFIX)
+                with gzip.open(tmp_file_path, 'wb') as file:
+                    file.write(data)
+                os.replace(tmp_file_path, os.path.join(path, file_name))
+                entry[field] = {"sidecar": file_name, "bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+                num_spilled += 1
+    return num_spilled
+
+
+def is_sidecar_reference(value):
+    """Returns true if a field of the extract JSON has been moved to a sidecar file"""
+    return isinstance(value, dict) and "sidecar" in value
+
+
+def load_sidecar(value, path):
+    """Return text of a field of the extract JSON, reading it from its sidecar file in path if it has been moved there"""
+    if not is_sidecar_reference(value):
+        return value
+    with gzip.open(os.path.join(path, value["sidecar"]), 'rb') as file:
+        data = file.read()
+    if len(data) != value["bytes"] or hashlib.sha256(data).hexdigest() != value["sha256"]:
+        raise ValueError("Sidecar file " + value["sidecar"] + " does not match its reference")
+    return data.decode('utf-8')
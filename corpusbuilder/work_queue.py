@@ -0,0 +1,61 @@
+import logging
+import os
+import socket
+import sqlite3
+import time
+
+
+class WorkQueue(object):
+    """A lease-based queue of PMCIDs in a SQLite file, shared by extraction workers on one or more hosts"""
+
+    def __init__(self, db_path, lease_seconds=600, worker_id=None):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds      # a claimed PMCID goes back to the queue if not completed within this time
+        self.worker_id = worker_id if worker_id else socket.gethostname() + "-" + str(os.getpid())
+        self.connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS items (pmc_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                                "worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0)")
+
+    def add(self, pmc_ids):
+        """Add PMCIDs to the queue (PMCIDs already in the queue are left as they are)"""
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany("INSERT OR IGNORE INTO items (pmc_id, status) VALUES (?, 'pending')",
+                                        [(pmc_id,) for pmc_id in pmc_ids])
+
+    def claim(self):
+        """Lease the next pending PMCID (or one whose lease expired), return None if there is none left"""
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            row = self.connection.execute("SELECT pmc_id FROM items WHERE status = 'pending' OR "
+                                          "(status = 'leased' AND lease_expires < ?) LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE items SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                                    "WHERE pmc_id = ?", (self.worker_id, now + self.lease_seconds, row[0]))
+        return row[0]
+
+    def complete(self, pmc_id):
+        """Mark a leased PMCID as done"""
+        self.__set_status(pmc_id, 'done')
+
+    def fail(self, pmc_id):
+        """Mark a leased PMCID as failed (it is not claimed again)"""
+        self.__set_status(pmc_id, 'failed')
+
+    def __set_status(self, pmc_id, status):
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute("UPDATE items SET status = ?, lease_expires = NULL WHERE pmc_id = ? AND worker = ?",
+                                    (status, pmc_id, self.worker_id))
+
+    def get_counts(self):
+        """Return dict mapping status (pending, leased, done, failed) to number of PMCIDs"""
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+
+    def log_counts(self):
+        logging.info('Work queue ' + self.db_path + ': ' + str(self.get_counts()))
+
+    def close(self):
+        self.connection.close()
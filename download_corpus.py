@@ -5,15 +5,23 @@ import logging
 from corpusbuilder.corpus_builder import CorpusBuilder
 from corpusbuilder.config import Config
 from corpusbuilder.command_line import CommandLineForDownload
+from corpusbuilder.helper import read_pmcid_file, read_query_file
 
 if __name__ == '__main__':
 
     logging.basicConfig(level=logging.DEBUG)
 
-    # get config and search terms from command line
+    # get config and search terms (or a batch of queries, or PMCIDs flagged by verify_corpus.py, from a file) from command line
     cmd_line = CommandLineForDownload()
     config = Config(cmd_line.get_config_file())
-    search_terms = cmd_line.get_search_terms()
+    pmc_ids = None
+    search_terms = ""
+    if cmd_line.get_pmcid_file():
+        pmc_ids = read_pmcid_file(cmd_line.get_pmcid_file())
+    elif cmd_line.get_query_file():
+        search_terms = read_query_file(cmd_line.get_query_file())
+    else:
+        search_terms = cmd_line.get_search_terms()
         
     # build the corpus
-    builder = CorpusBuilder(config, search_terms)
+    builder = CorpusBuilder(config, search_terms, pmc_ids)
@@ -1,14 +1,15 @@
 """ Script to extract table and image data from downloaded corpus documents """
 
 import logging
+import sys
 import traceback
 
 from corpusbuilder.config import Config
-from corpusbuilder.corpus_builder import CorpusBuilder
 from corpusbuilder.command_line import CommandLineForExtract
 from corpusbuilder.document_index import DocumentIndex
+from corpusbuilder.extraction_engine import ExtractionEngine
+from corpusbuilder.work_queue import WorkQueue
 from corpusbuilder.helper import *
-import spacy
 
 if __name__ == '__main__':
     
@@ -22,37 +23,94 @@ if __name__ == '__main__':
     # create corpus extract directory if doesn't exist
     create_dir(config.corpus_extract_dir)
 
+    # only merge run reports of shards/workers, if requested
+    if cmd_line.get_merge_reports():
+        merged_report = merge_run_reports(config.corpus_extract_dir)
+        logging.info('Merged ' + str(len(merged_report["reports"])) + ' run reports: ' + str(merged_report["num_processed"]) +
+                     ' articles processed, ' + str(merged_report["num_failed"]) + ' failed')
+        sys.exit(0)
+
     # instantiate file metadata from index file
     document_index = DocumentIndex(index_file, config)
 
     # file extensions of interest
     FILE_EXTENSION_NXML = ["nxml"]
-    FILE_EXTENSION_IMAGE = ["gif", "jpeg", "jpg", "png", "tif", "tiff", "bmp", "eps"]
+    FILE_EXTENSION_IMAGE = IMAGE_FILE_EXTENSIONS
+
+    # spaCy model, image store, query index and extraction settings, set up once for all articles
+    engine = ExtractionEngine(config, document_index)
+
+    # find article folders (containing .nxml files) in the corpus download directory
+    article_dirs = {}
+    for root, dirs, files in os.walk(config.corpus_download_dir):
+        if has_nxml_file(files):
+            article_dirs[os.path.basename(root)] = root
+    pmc_ids = sorted(article_dirs)
+
+    # after verify_corpus.py --delete, only extract the articles it flagged
+    if cmd_line.get_pmcid_file():
+        pmc_ids = sorted(set(read_pmcid_file(cmd_line.get_pmcid_file())))
+        logging.info('Extracting ' + str(len(pmc_ids)) + ' PMCIDs in ' + cmd_line.get_pmcid_file())
+
+    # when sharding, only keep this shard's articles
+    shard = cmd_line.get_shard()
+    if shard:
+        shard_index, num_shards = parse_shard(shard)
+        pmc_ids = [pmc_id for pmc_id in pmc_ids if get_shard(pmc_id, num_shards) == shard_index]
+        logging.info('Shard ' + shard + ': ' + str(len(pmc_ids)) + ' of ' + str(len(article_dirs)) + ' articles')
 
-    # Initializing spacy
-    nlp = spacy.load(config.spacy_model)
+    # when using a work queue, articles are claimed one by one, so that several workers can share them
+    work_queue = None
+    if cmd_line.get_queue_file():
+        work_queue = WorkQueue(cmd_line.get_queue_file(), cmd_line.get_lease_seconds())
+        work_queue.add(pmc_ids)
+        pmc_ids = iter(work_queue.claim, None)
 
     # for each article in the corpus download directory, create json file(s)
     num_processed = 0
+    run_report = {"shard": shard, "worker": work_queue.worker_id if work_queue is not None else "",
+                  "num_processed": 0, "num_failed": 0, "processed": [], "failed": []}
     logging.info('Extracting table and image data from documents in ' + config.corpus_download_dir + '...')
-    for root, dirs, files in os.walk(config.corpus_download_dir):
-        path = root.split(os.sep)
-        if has_nxml_file(files):
-            pmc_id = os.path.basename(root)
-            metadata = document_index.get_metadata(pmc_id)
-            
-            nxml_files = replace_slashes(get_file_paths(FILE_EXTENSION_NXML, root))
-            image_files = replace_slashes(get_file_paths(FILE_EXTENSION_IMAGE, root))
-
-            corpus_extract_subdir = config.corpus_extract_dir + pmc_id
-            create_dir(corpus_extract_subdir)
-
-            for nxml_file in nxml_files:
-                try:
-                    extract_json = CorpusBuilder.populate_template(nlp, pmc_id, nxml_file, metadata['pmc_license'], image_files)
-                    write_json(corpus_extract_subdir, pmc_id, extract_json)
-                    num_processed += 1
-                except Exception as exception:
-                    logging.error('Failed to extract JSON from ' + str(pmc_id))
-                    traceback.print_exception(type(exception), exception, exception.__traceback__)
+    for pmc_id in pmc_ids:
+        if pmc_id not in article_dirs:
+            logging.error('No article folder for ' + str(pmc_id) + ' in ' + config.corpus_download_dir)
+            run_report["failed"].append(pmc_id)
+            if work_queue is not None:
+                work_queue.fail(pmc_id)
+            continue
+        root = article_dirs[pmc_id]
+        metadata = document_index.get_metadata(pmc_id)
+
+        nxml_files = replace_slashes(get_file_paths(FILE_EXTENSION_NXML, root))
+        image_files = replace_slashes(get_file_paths(FILE_EXTENSION_IMAGE, root))
+
+        failed = False
+        for nxml_file in nxml_files:
+            try:
+                extract_json = engine.extract(pmc_id, nxml_file, metadata['pmc_license'], image_files)
+                engine.write(extract_json)
+                num_processed += 1
+            except Exception as exception:
+                failed = True
+                logging.error('Failed to extract JSON from ' + str(pmc_id))
+                traceback.print_exception(type(exception), exception, exception.__traceback__)
+
+        run_report["failed" if failed else "processed"].append(pmc_id)
+        if work_queue is not None:
+            if failed:
+                work_queue.fail(pmc_id)
+            else:
+                work_queue.complete(pmc_id)
+
     logging.info('Extracted table and image data from ' + str(num_processed) + ' documents')
+    if shard or work_queue is not None:
+        run_report["num_processed"] = len(run_report["processed"])
+        run_report["num_failed"] = len(run_report["failed"])
+        report_name = "run-report-" + (shard.replace("/", "-of-") if shard else "all")
+        if work_queue is not None:
+            report_name = report_name + "-" + work_queue.worker_id
+            work_queue.log_counts()
+            work_queue.close()
+        write_json(config.corpus_extract_dir, report_name, run_report)
+    engine.log_stats()
+    engine.close()
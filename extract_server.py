@@ -0,0 +1,36 @@
+""" Script to serve table and image data extraction requests from a warm process (spaCy model etc. loaded once) """
+
+import logging
+
+from corpusbuilder.config import Config
+from corpusbuilder.command_line import CommandLineForServer
+from corpusbuilder.document_index import DocumentIndex
+from corpusbuilder.extraction_engine import ExtractionEngine, ExtractionServer
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    # get items from command line
+    cmd_line = CommandLineForServer()
+    config = Config(cmd_line.get_config_file())
+
+    # licenses are looked up in the index file, if given
+    document_index = None
+    if cmd_line.get_index_file():
+        document_index = DocumentIndex(cmd_line.get_index_file(), config)
+
+    # load everything up front, so that the first request is as fast as the others
+    engine = ExtractionEngine(config, document_index)
+    engine.warm_up()
+
+    server = ExtractionServer(engine, cmd_line.get_host(), cmd_line.get_port())
+    logging.info('Extraction server listening on http://' + cmd_line.get_host() + ':' + str(cmd_line.get_port()))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        engine.log_stats()
+        engine.close()
@@ -0,0 +1,46 @@
+""" Script to query the index of extracted corpus documents """
+
+import json
+import logging
+import sqlite3
+import sys
+import time
+
+from corpusbuilder.config import Config
+from corpusbuilder.command_line import CommandLineForQuery
+from corpusbuilder.query_index import QueryIndex
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    # get config and filters from command line
+    cmd_line = CommandLineForQuery()
+    config = Config(cmd_line.get_config_file())
+    if not config.query_index_file:
+        logging.error('QueryIndexFile is not set in ' + cmd_line.get_config_file())
+        sys.exit(1)
+
+    query_index = QueryIndex(config.query_index_file)
+
+    # re-index the corpus extract directory, if requested
+    if cmd_line.get_rebuild():
+        num_indexed = query_index.rebuild(config.corpus_extract_dir)
+        logging.info('Indexed ' + str(num_indexed) + ' articles from ' + config.corpus_extract_dir)
+        query_index.close()
+        sys.exit(0)
+
+    # print matching PMCIDs, or matching records as JSON lines
+    start = time.perf_counter()
+    try:
+        results = query_index.query(records=cmd_line.get_records(), fts_syntax=cmd_line.get_fts_syntax(),
+                                    **cmd_line.get_filters())
+    except sqlite3.OperationalError as error:
+        logging.error('Invalid query' + (' (check the FTS5 syntax of --caption)' if cmd_line.get_fts_syntax() else '') +
+                      ': ' + str(error))
+        query_index.close()
+        sys.exit(2)
+    logging.info('Found ' + str(len(results)) + ' results in ' + str(round((time.perf_counter() - start) * 1000, 1)) + ' ms')
+    for result in results:
+        print(json.dumps(result) if cmd_line.get_records() else result)
+    query_index.close()
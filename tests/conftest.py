@@ -0,0 +1,20 @@
+""" Fixtures shared by the tests"""
+
+import io
+import tarfile
+
+import pytest
+
+
+@pytest.fixture
+def make_archive():
+    """Function returning the content of a tar.gz archive, given a dict of member names to their content"""
+    def make(files):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for name, data in files.items():
+                member = tarfile.TarInfo(name)
+                member.size = len(data)
+                archive.addfile(member, io.BytesIO(data))
+        return buffer.getvalue()
+    return make
@@ -1,10 +1,13 @@
 """ Test parsing affiliations"""
 
+import copy
 import spacy
 from bs4 import BeautifulSoup
 
 from corpusbuilder.corpus_builder import CorpusBuilder
 from corpusbuilder.config import Config
+from corpusbuilder.helper import get_file_paths, get_text_excluding_tags
+from corpusbuilder.affiliation_resolver import AffiliationResolver, rule_name_location, CONFIDENCE_HIGH, CONFIDENCE_NONE
 
 
 def test_affiliation():
@@ -47,3 +50,43 @@ def test_affiliation():
     assert aff_dic["name"] == "Department of Microbiological Sciences, North Dakota State University"
     assert aff_dic["location"] == "Fargo, ND 58104"
     assert aff_dic["country"] == "USA"
+
+
+def test_affiliation_rules():
+
+    # rule-based tier only, no spaCy model needed
+    resolver = AffiliationResolver(mode="rules")
+
+    aff = BeautifulSoup('<aff id="aff003"><label>3</label><addr-line>Commonwealth Trade Partners Inc., Alexandria, VA, United States of America</addr-line></aff>', "html.parser")
+    aff_dic = CorpusBuilder.get_affiliation(aff, resolver)
+    assert aff_dic["name"] == "Commonwealth Trade Partners Inc."
+    assert aff_dic["location"] == "Alexandria, VA"
+    assert aff_dic["country"] == "United States of America"
+
+    aff = BeautifulSoup('<aff id="af1-vaccines-09-00030">Department of Microbiological Sciences, North Dakota State University, Fargo, ND 58104, USA; <email>Birgit.Pruess@ndsu.edu</email>; Tel.: +1-701-231-7848</aff>', "html.parser")
+    aff_dic = CorpusBuilder.get_affiliation(aff, resolver)
+    assert aff_dic["name"] == "Department of Microbiological Sciences, North Dakota State University"
+    assert aff_dic["location"] == "Fargo, ND 58104"
+    assert aff_dic["country"] == "USA"
+    assert resolver.stats == {"rules": 2, "spacy": 0}
+
+    # confidence used to decide on spaCy fallback in tiered mode
+    assert rule_name_location("Max Planck Institute for Biology, Tübingen")[1] == CONFIDENCE_HIGH
+    assert rule_name_location("Tübingen")[1] == CONFIDENCE_NONE
+
+
+def test_affiliation_text_parity():
+
+    # text without excluded tags must match the text of a copy with those tags decomposed
+    excluded_tags_list = [['institution-wrap', 'label'],
+                          ['institution', 'label', 'sup', 'named-content'],
+                          ['institution-wrap', 'institution', 'label', 'sup', 'email', 'named-content']]
+    for nxml_file in get_file_paths(["nxml"], "tests"):
+        with open(nxml_file, encoding='utf-8') as xml_file:
+            affs = BeautifulSoup(xml_file.read(), "html.parser").find_all('aff')
+        for aff in affs:
+            for excluded_tags in excluded_tags_list:
+                temp = copy.copy(aff)
+                for label in excluded_tags:
+                    CorpusBuilder.decompose_tag(temp, label)
+                assert get_text_excluding_tags(aff, excluded_tags) == temp.get_text()
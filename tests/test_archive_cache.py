@@ -0,0 +1,125 @@
+""" Test the local archive cache shared across runs"""
+
+import os
+
+import corpusbuilder.archive_cache as archive_cache_module
+from corpusbuilder.archive_cache import ArchiveCache
+
+
+def test_archive_cache(tmp_path, make_archive):
+    archive = make_archive({"PMC1/PMC1.nxml": b"1" * 10})
+    (tmp_path / "PMC2.tar.gz").write_bytes(make_archive({"PMC2/PMC2.nxml": b"2" * 20}))
+    archive_cache = ArchiveCache(str(tmp_path / "cache"), max_bytes=len(archive) + os.path.getsize(str(tmp_path / "PMC2.tar.gz")) - 1)
+    key_1 = ArchiveCache.get_key("oa_package/08/e0/", "PMC1.tar.gz", "2019-11-05 11:56:12")
+    key_2 = ArchiveCache.get_key("oa_package/08/e0/", "PMC2.tar.gz", "2019-11-05 11:56:12")
+    assert key_1 != ArchiveCache.get_key("oa_package/08/e0/", "PMC1.tar.gz", "2021-01-01 00:00:00")
+
+    output_file = str(tmp_path / "PMC1.tar.gz")
+    assert not archive_cache.fetch(key_1, output_file)
+    (tmp_path / "PMC1.tar.gz").write_bytes(archive)
+    archive_cache.store(key_1, output_file)
+    os.remove(output_file)
+    assert archive_cache.fetch(key_1, output_file)
+    assert (tmp_path / "PMC1.tar.gz").read_bytes() == archive
+    assert archive_cache.get_hit_rate() == 0.5
+
+    # storing a second archive goes over the size cap, least recently used archive is evicted
+    os.utime(archive_cache.get_cache_path(key_1), (0, 0))
+    archive_cache.store(key_2, str(tmp_path / "PMC2.tar.gz"))
+    assert not os.path.exists(archive_cache.get_cache_path(key_1))
+    assert os.path.exists(archive_cache.get_cache_path(key_2))
+
+
+def test_archive_cache_running_total(tmp_path, monkeypatch):
+    archive_cache = ArchiveCache(str(tmp_path / "cache"), max_bytes=100)
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(os, "walk", lambda path: walks.append(path) or real_walk(path))
+
+    # the cache is measured once, then stores under the cap do not scan it again
+    for i in range(5):
+        if (tmp_path / "PMC.tar.gz").exists():
+            (tmp_path / "PMC.tar.gz").unlink()     # it is a hard link to the previous cached archive
+        (tmp_path / "PMC.tar.gz").write_bytes(b"x" * 15)
+        archive_cache.store(ArchiveCache.get_key("oa_package/", "PMC" + str(i) + ".tar.gz", ""), str(tmp_path / "PMC.tar.gz"))
+    assert len(walks) == 1
+    assert archive_cache.total_bytes == 75
+
+    # reaching the cap does not scan, each store going over it scans and evicts
+    for i in range(5, 8):
+        if (tmp_path / "PMC.tar.gz").exists():
+            (tmp_path / "PMC.tar.gz").unlink()     # it is a hard link to the previous cached archive
+        (tmp_path / "PMC.tar.gz").write_bytes(b"x" * 15)
+        archive_cache.store(ArchiveCache.get_key("oa_package/", "PMC" + str(i) + ".tar.gz", ""), str(tmp_path / "PMC.tar.gz"))
+    assert len(walks) == 3
+    assert archive_cache.total_bytes == 90
+
+
+def test_archive_cache_corrupt_entry(tmp_path, make_archive):
+    archive_cache = ArchiveCache(str(tmp_path / "cache"), max_bytes=1000000)
+    key = ArchiveCache.get_key("oa_package/08/e0/", "PMC1.tar.gz", "2019-11-05 11:56:12")
+    (tmp_path / "PMC1.tar.gz").write_bytes(make_archive({"PMC1/PMC1.nxml": b"<article></article>"}))
+    archive_cache.store(key, str(tmp_path / "PMC1.tar.gz"))
+    os.remove(str(tmp_path / "PMC1.tar.gz"))
+    output_file = str(tmp_path / "out.tar.gz")
+    assert archive_cache.fetch(key, output_file)
+
+    # a cached archive damaged on disk no longer matches its sha256, is evicted and counted as a miss
+    os.remove(output_file)
+    cache_path = archive_cache.get_cache_path(key)
+    with open(cache_path, 'r+b') as file:
+        file.seek(-8, os.SEEK_END)
+        file.write(b"\0" * 8)     # gzip trailer (CRC and size)
+    assert not archive_cache.fetch(key, output_file)
+    assert not os.path.exists(cache_path)
+    assert not os.path.exists(ArchiveCache.get_checksum_path(cache_path))
+    assert not os.path.exists(output_file)
+    assert archive_cache.total_bytes == 0
+    assert (archive_cache.hits, archive_cache.misses) == (1, 1)
+
+
+def test_archive_cache_checksum(tmp_path, monkeypatch, make_archive):
+    archive_cache = ArchiveCache(str(tmp_path / "cache"))
+    key = ArchiveCache.get_key("oa_package/08/e0/", "PMC1.tar.gz", "2019-11-05 11:56:12")
+    (tmp_path / "PMC1.tar.gz").write_bytes(make_archive({"PMC1/PMC1.nxml": b"<article></article>"}))
+    archive_cache.store(key, str(tmp_path / "PMC1.tar.gz"))
+    os.remove(str(tmp_path / "PMC1.tar.gz"))
+    output_file = str(tmp_path / "out.tar.gz")
+
+    # an archive stored before checksums were recorded is verified in full once, later hits only check its sha256
+    checksum_path = ArchiveCache.get_checksum_path(archive_cache.get_cache_path(key))
+    os.remove(checksum_path)
+    verified = []
+    monkeypatch.setattr(archive_cache_module, "get_tar_file_error", lambda path: verified.append(path) or "")
+    assert archive_cache.fetch(key, output_file)
+    assert os.path.exists(checksum_path)
+    os.remove(output_file)
+    assert archive_cache.fetch(key, output_file)
+    assert len(verified) == 1
+
+
+def test_archive_cache_shared(tmp_path, monkeypatch, make_archive):
+    archive_cache = ArchiveCache(str(tmp_path / "cache"), max_bytes=1)
+    key = ArchiveCache.get_key("oa_package/08/e0/", "PMC1.tar.gz", "2019-11-05 11:56:12")
+    cache_path = archive_cache.get_cache_path(key)
+
+    # a .part file of an archive another run is storing is not evicted
+    other_path = archive_cache.get_cache_path(ArchiveCache.get_key("oa_package/08/e0/", "PMC2.tar.gz", "")) + ".part"
+    os.makedirs(os.path.dirname(other_path))
+    with open(other_path, 'wb') as file:
+        file.write(b"x" * 100)
+    (tmp_path / "PMC1.tar.gz").write_bytes(make_archive({"PMC1/PMC1.nxml": b"<article></article>"}))
+    archive_cache.store(key, str(tmp_path / "PMC1.tar.gz"))
+    assert not os.path.exists(cache_path)
+    assert os.path.exists(other_path)
+    assert archive_cache.total_bytes == 0
+
+    # an archive evicted by another run while it is being fetched is a miss
+    archive_cache.max_bytes = 0
+    archive_cache.store(key, str(tmp_path / "PMC1.tar.gz"))
+
+    def evicted(src, dst):
+        raise FileNotFoundError(src)
+    monkeypatch.setattr(archive_cache_module, "link_or_copy", evicted)
+    assert not archive_cache.fetch(key, str(tmp_path / "out.tar.gz"))
+    assert (archive_cache.hits, archive_cache.misses) == (0, 1)
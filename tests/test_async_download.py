@@ -0,0 +1,65 @@
+""" Test the asyncio download engine against a local server standing in for the PMC server"""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from corpusbuilder.archive_cache import ArchiveCache
+from corpusbuilder.config import Config
+
+web = pytest.importorskip("aiohttp.web")
+
+from corpusbuilder.async_download import AsyncDownload
+
+
+def start_server(archives, port_holder, started):
+    """Serve archives under pub/pmc/ (404 for others) in a thread with its own event loop"""
+    async def handle(request):
+        file_name = request.match_info["path"].split("/")[-1]
+        if file_name not in archives:
+            return web.Response(status=404)
+        return web.Response(body=archives[file_name])
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/pub/pmc/{path:.*}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port_holder.append(site._server.sockets[0].getsockname()[1])
+        started.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def test_async_download(tmp_path, make_archive):
+    archives = {pmc_id + ".tar.gz": make_archive({pmc_id + "/article.nxml": b"<article>" + pmc_id.encode('utf-8') + b"</article>"})
+                for pmc_id in ["PMC1", "PMC2", "PMC4"]}
+    archives["PMC4.tar.gz"] = archives["PMC4.tar.gz"][:-20]     # truncated, so it fails verification
+    port_holder = []
+    started = threading.Event()
+    threading.Thread(target=start_server, args=(archives, port_holder, started), daemon=True).start()
+    started.wait()
+
+    config = Config("config.ini")
+    config.pubmed_https_url = "http://127.0.0.1:" + str(port_holder[0])
+    config.corpus_download_dir = str(tmp_path / "corpus-download") + "/"
+    config.max_concurrent_downloads = 2
+    metadata_list = [{'result': True, 'ftp_file_path': "oa_package/", 'file_name': pmc_id + ".tar.gz", 'pmc_id': pmc_id,
+                      'pmc_license': 'CC BY', 'last_updated': ""} for pmc_id in ["PMC1", "PMC2", "PMC3", "PMC4"]]
+
+    archive_cache = ArchiveCache(str(tmp_path / "archive-cache"))
+    async_download = AsyncDownload(config, archive_cache)
+    assert async_download.get_url("pub/pmc/oa_package/", "PMC1.tar.gz") == config.pubmed_https_url + "/pub/pmc/oa_package/PMC1.tar.gz"
+    assert async_download.download_and_extract_all(metadata_list) == 2
+    assert async_download.num_failed == 2
+    assert sorted(os.listdir(config.corpus_download_dir)) == ["PMC1", "PMC2"]
+
+    # a second run gets the archives from the cache
+    async_download = AsyncDownload(config, archive_cache)
+    assert async_download.download_and_extract_all(metadata_list[:2]) == 2
+    assert archive_cache.hits == 2
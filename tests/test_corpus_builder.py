@@ -1,7 +1,13 @@
 import json
+import os
+import tracemalloc
+import pytest
+from corpusbuilder.archive_cache import ArchiveCache
 from corpusbuilder.corpus_builder import CorpusBuilder
+from corpusbuilder.disk_governor import DiskGovernor
 import spacy
 from corpusbuilder.config import Config
+from corpusbuilder.helper import measure_peak_memory, replace_encodings, read_query_file, EXTENDED_ENTITY_REPLACEMENTS
 
 
 def test_extract_PMC7493720():
@@ -42,13 +48,140 @@ def test_extract_PMC7826947():
     compare(nxml_file_path, pmc_id, license, image_files, expected_extract_file_path)
 
 
-def compare(nxml_file_path, pmc_id, license, image_files, expected_extract_file_path):
+def test_extract_PMC7826947_bounded_memory():
+    nxml_file_path = "tests/corpus-download/PMC7826947/vaccines-09-00030.nxml"
+    pmc_id = "PMC7826947"
+    license = 'CC BY'
+    image_files = ["tests/corpus-download/PMC7826947/vaccines-09-00030-g001.gif","tests/corpus-download/PMC7826947/vaccines-09-00030-g001.jpg"]
+    expected_extract_file_path = "tests/corpus-extract/PMC7826947/PMC7826947.json"
+    compare(nxml_file_path, pmc_id, license, image_files, expected_extract_file_path, bounded_memory=True)
+
+
+def test_replace_encodings():
+    # all spellings of a character reference are replaced, other character references are left alone
+    assert replace_encodings("1&#x000a0;mg&#xA0;&#160;&#x02212;2&#8722;&#x02009;&#x0003c;") == "1 mg  -2-&#x02009;&#x0003c;"
+    assert replace_encodings("&#x02009;&#x02011;", EXTENDED_ENTITY_REPLACEMENTS) == " -"
+
+
+def test_measure_peak_memory():
+    result, peak = measure_peak_memory(lambda size: len(bytearray(size)), 1000000)
+    assert result == 1000000 and peak >= 1000000
+    assert not tracemalloc.is_tracing()
+
+    # tracing started by the caller is left running
+    tracemalloc.start()
+    try:
+        result, peak = measure_peak_memory(lambda size: len(bytearray(size)), 1000000)
+        assert peak >= 1000000
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_config_entity_replacements(tmp_path):
+    config_file = tmp_path / "config.ini"
+    with open("config.ini", 'r') as file:
+        config_file.write_text(file.read().replace("EntityReplacements=default", "EntityReplacements=extnded"))
+    with pytest.raises(ValueError, match="expected one of: default, extended"):
+        Config(str(config_file))
+
+
+def test_read_query_file(tmp_path):
+    query_file = tmp_path / "queries.txt"
+    query_file.write_text("# covid queries\n(covid)+AND+(vaccine)\n\n  covid  \n")
+    assert read_query_file(str(query_file)) == ["(covid)+AND+(vaccine)", "covid"]
+
+
+def get_builder(tmp_path, monkeypatch, search_terms):
+    """Return a CorpusBuilder that has not built anything yet, with PubMed search replaced by fixed results"""
+    results = {"covid": ["3", "1", "2"], "vaccine": ["2", "4"]}
+    monkeypatch.setattr(CorpusBuilder, "_CorpusBuilder__retrieve_pmcids", lambda self, query: results[query])
+    builder = CorpusBuilder.__new__(CorpusBuilder)
+    builder.config = Config("config.ini")
+    builder.config.corpus_download_dir = str(tmp_path) + "/"
+    builder.search_terms = search_terms
+    return builder
+
+
+def test_retrieve_all_pmcids(tmp_path, monkeypatch):
+    # PMCIDs matched by several queries are kept once, in order of first match
+    assert get_builder(tmp_path, monkeypatch, ["covid", "vaccine"]).retrieve_all_pmcids() == ["3", "1", "2", "4"]
+    with open(str(tmp_path / "query-pmcids.json"), 'r') as file:
+        assert json.load(file) == {"covid": ["PMC3", "PMC1", "PMC2"], "vaccine": ["PMC2", "PMC4"]}
+
+
+def test_retrieve_all_pmcids_mapping(tmp_path, monkeypatch):
+    # a batch of one query still gets its mapping, a single search term string does not
+    get_builder(tmp_path, monkeypatch, ["vaccine"]).retrieve_all_pmcids()
+    with open(str(tmp_path / "query-pmcids.json"), 'r') as file:
+        assert json.load(file) == {"vaccine": ["PMC2", "PMC4"]}
+    (tmp_path / "query-pmcids.json").unlink()
+    assert get_builder(tmp_path, monkeypatch, "covid").retrieve_all_pmcids() == ["3", "1", "2"]
+    assert not (tmp_path / "query-pmcids.json").exists()
+
+
+def test_retrieve_all_pmcids_given(tmp_path, monkeypatch):
+    # PMCIDs flagged by verify_corpus.py are retrieved without searching PubMed
+    builder = get_builder(tmp_path, monkeypatch, "")
+    builder.pmc_ids = ["PMC2", "PMC4", "PMC2"]
+    assert builder.retrieve_all_pmcids() == ["2", "4"]
+    assert not (tmp_path / "query-pmcids.json").exists()
+
+
+class FakeFTPDownload(object):
+    """Stands in for FTPDownload, serving the given archives (others fail to download, as download_ftp_file does)"""
+
+    def __init__(self, config, archives):
+        self.config = config
+        self.archives = archives
+        self.downloaded = []
+
+    def get_remote_file_size(self, path, file_name):
+        return None
+
+    def download_ftp_file(self, path, file_name, cache_key=None, try_cache=True):
+        self.downloaded.append(file_name)
+        if file_name in self.archives:
+            with open(self.config.corpus_download_dir + file_name, 'wb') as file:
+                file.write(self.archives[file_name])
+        return False
+
+
+def test_download_and_extract_all(tmp_path, monkeypatch, make_archive):
+    builder = get_builder(tmp_path, monkeypatch, "")
+    archives = {pmc_id + ".tar.gz": make_archive({pmc_id + "/article.nxml": b"<article></article>"}) for pmc_id in ["PMC1", "PMC2"]}
+    ftp_download = FakeFTPDownload(builder.config, archives)
+    metadata_list = [{'ftp_file_path': "oa_package/", 'file_name': pmc_id + ".tar.gz", 'last_updated': ""}
+                     for pmc_id in ["PMC1", "PMC2", "PMC3"]]
+
+    # PMC1 is cached but corrupt, so it is downloaded (and reserved as a download), PMC3 fails to download
+    archive_cache = ArchiveCache(str(tmp_path / "archive-cache"))
+    cache_key = ArchiveCache.get_key("oa_package/", "PMC1.tar.gz", "")
+    (tmp_path / "cached.tar.gz").write_bytes(archives["PMC1.tar.gz"])
+    archive_cache.store(cache_key, str(tmp_path / "cached.tar.gz"))
+    with open(archive_cache.get_cache_path(cache_key), 'r+b') as file:
+        file.write(b"\0" * 16)
+    reserved = []
+    disk_governor = DiskGovernor(str(tmp_path), max_download_bytes=1 << 40)
+    real_reserve = disk_governor.reserve
+    monkeypatch.setattr(disk_governor, "reserve", lambda archive_bytes, from_cache=False:
+                        reserved.append(from_cache) or real_reserve(archive_bytes, from_cache))
+
+    assert builder.download_and_extract_all(metadata_list, ftp_download, archive_cache, None, disk_governor) == 2
+    assert ftp_download.downloaded == ["PMC1.tar.gz", "PMC2.tar.gz", "PMC3.tar.gz"]
+    assert reserved == [True, False, False, False]
+    assert disk_governor.stats["archives"] == 2
+    assert disk_governor.reserved_download == 0 and disk_governor.reserved_disk == 0
+    assert sorted(os.listdir(str(tmp_path))) == ["PMC1", "PMC2", "archive-cache", "cached.tar.gz"]
+
+
+def compare(nxml_file_path, pmc_id, license, image_files, expected_extract_file_path, bounded_memory=False):
     """ Compare generated vs expected extract json"""
 
     # extract json generated by code
     config = Config("config.ini")
     nlp = spacy.load(config.spacy_model)
-    extract_json = CorpusBuilder.populate_template(nlp, pmc_id, nxml_file_path, license, image_files)
+    extract_json = CorpusBuilder.populate_template(nlp, pmc_id, nxml_file_path, license, image_files, bounded_memory)
 
     # expected json
     f = open(expected_extract_file_path, "r")
@@ -0,0 +1,48 @@
+""" Test the disk usage and download budget governor"""
+
+from corpusbuilder.disk_governor import DEFAULT_ARCHIVE_BYTES, DiskGovernor
+from corpusbuilder.helper import extract_tar_file
+
+
+def test_download_budget(tmp_path):
+    disk_governor = DiskGovernor(str(tmp_path), max_download_bytes=1000)
+    first = disk_governor.reserve(600)
+    assert first == (600, 1200)
+    # the second archive would go over budget while the first one is still reserved
+    assert disk_governor.reserve(600) is None
+    assert disk_governor.is_stopped()
+
+    disk_governor.release(first, 600, 1800)
+    assert disk_governor.stats == {"downloaded": 600, "cached": 0, "extracted": 1800, "archives": 1}
+    assert disk_governor.get_extract_ratio() == 3.0
+
+
+def test_unknown_size(tmp_path):
+    # archives whose size the server does not report are counted at the default size, then at the mean size so far
+    disk_governor = DiskGovernor(str(tmp_path), max_download_bytes=DEFAULT_ARCHIVE_BYTES * 2)
+    first = disk_governor.reserve(None)
+    assert first == (DEFAULT_ARCHIVE_BYTES, DEFAULT_ARCHIVE_BYTES * 2)
+    disk_governor.release(first, 1000, 1000)
+    assert disk_governor.estimate(None) == (1000, 2000)
+    assert disk_governor.reserve(None, from_cache=True) == (0, 1000)
+
+    disk_governor = DiskGovernor(str(tmp_path), max_download_bytes=DEFAULT_ARCHIVE_BYTES)
+    assert disk_governor.reserve(None) is not None
+    assert disk_governor.reserve(None) is None
+
+
+def test_min_free_space(tmp_path):
+    disk_governor = DiskGovernor(str(tmp_path), min_free_bytes=1 << 60)
+    assert disk_governor.reserve(100) is None
+    assert "free space" in disk_governor.stop_reason
+
+    # archives from the cache are not counted against the download budget
+    disk_governor = DiskGovernor(str(tmp_path), max_download_bytes=10)
+    assert disk_governor.reserve(100, from_cache=True) == (0, 100)
+
+
+def test_extract_tar_file_size(tmp_path, make_archive):
+    tar_file_path = str(tmp_path / "PMC1.tar.gz")
+    (tmp_path / "PMC1.tar.gz").write_bytes(make_archive({"PMC1/article.nxml": b"x" * 300, "PMC1/figure1.jpg": b"x" * 200}))
+    assert extract_tar_file(str(tmp_path), tar_file_path) == 500
+    assert (tmp_path / "PMC1" / "figure1.jpg").exists()
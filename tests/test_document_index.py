@@ -0,0 +1,31 @@
+""" Test metadata lookup and license filtering in the document index"""
+
+from corpusbuilder.config import Config
+from corpusbuilder.document_index import DocumentIndex
+
+INDEX_CSV = """File,Article Citation,Accession ID,Last Updated (YYYY-MM-DD HH:MM:SS),PMID,License
+oa_package/08/e0/PMC13900.tar.gz,Breast Cancer Res. 2001 Nov 2; 3(1):55-60,PMC13900,2019-11-05 11:56:12,11250746,CC BY
+oa_package/b0/ac/PMC13901.tar.gz,Breast Cancer Res. 2001 Nov 9; 3(1):61-65,PMC13901,2019-11-05 11:56:12,11250747,NO-CC CODE
+oa_package/f7/98/PMC13902.tar.gz,Breast Cancer Res. 2001 Nov 8; 3(1):66-75,PMC13902,2019-11-05 11:56:12,11250748,CC0
+"""
+
+
+def test_get_metadata_many(tmp_path):
+    index_file = tmp_path / "oa_comm_use_file_list.csv"
+    index_file.write_text(INDEX_CSV)
+    config = Config("config.ini")
+    document_index = DocumentIndex(str(index_file), config)
+
+    accession_ids = ["PMC13900", "PMC13901", "PMC13902", "PMC99999", "PMC13900"]
+    metadata_list = document_index.get_metadata_many(accession_ids)
+    assert [metadata['pmc_id'] for metadata in metadata_list] == ["PMC13900", "PMC13902"]
+    assert metadata_list[0] == document_index.get_metadata("PMC13900")
+    assert metadata_list[0]['ftp_file_path'] == "oa_package/08/e0/"
+    assert metadata_list[0]['file_name'] == "PMC13900.tar.gz"
+    assert document_index.get_license_rejected(accession_ids) == ["PMC13901"]
+    assert document_index.get_metadata("PMC13901")['result'] is False
+
+    # license filter is configurable
+    config.licenses = ["CC0"]
+    document_index = DocumentIndex(str(index_file), config)
+    assert [metadata['pmc_id'] for metadata in document_index.get_metadata_many(accession_ids)] == ["PMC13902"]
@@ -0,0 +1,86 @@
+""" Test the reusable extraction engine and the extraction server"""
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+from corpusbuilder.config import Config
+from corpusbuilder.extraction_engine import ExtractionEngine, ExtractionServer
+
+
+def get_engine(tmp_path):
+    config = Config("config.ini")
+    config.affiliation_ner = "rules"
+    config.corpus_extract_dir = str(tmp_path) + "/"
+    return ExtractionEngine(config)
+
+
+def test_extraction_engine(tmp_path):
+    engine = get_engine(tmp_path)
+    engine.warm_up()
+    extract_json = engine.extract_path("tests/corpus-download/PMC7826947/vaccines-09-00030.nxml", license="CC BY")
+    with open("tests/corpus-extract/PMC7826947/PMC7826947.json", 'r') as file:
+        expected_json = json.load(file)
+    assert extract_json["pmc_id"] == "PMC7826947"
+    assert extract_json["html_tables"] == expected_json["html_tables"]
+    assert extract_json["figures"] == expected_json["figures"]
+
+    engine.write(extract_json)
+    with open(str(tmp_path / "PMC7826947" / "PMC7826947.json"), 'r') as file:
+        assert json.load(file) == extract_json
+
+
+def post(url, request_json, content_type="application/json"):
+    """Return (status, response JSON) of a POST request"""
+    request = urllib.request.Request(url, method="POST", data=json.dumps(request_json).encode('utf-8'),
+                                     headers={"Content-Type": content_type})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_extraction_server(tmp_path):
+    engine = get_engine(tmp_path)
+    engine.config.corpus_download_dir = "tests/corpus-download/"
+    server = ExtractionServer(engine, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:" + str(server.server_address[1])
+    try:
+        status, extract_json = post(url + "/extract", {"nxml_file": "tests/corpus-download/PMC7493720/bmm-2020-0309.nxml",
+                                                       "license": "CC BY"})
+        assert status == 200
+        assert extract_json["pmc_id"] == "PMC7493720"
+        assert len(extract_json["html_tables"]) > 0
+
+        with urllib.request.urlopen(url + "/status") as response:
+            assert json.loads(response.read()) == {"num_extracted": 1, "num_failed": 0}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_extraction_server_rejects(tmp_path):
+    engine = get_engine(tmp_path)
+    engine.config.corpus_download_dir = "tests/corpus-download/"
+    server = ExtractionServer(engine, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:" + str(server.server_address[1]) + "/extract"
+    nxml_file = "tests/corpus-download/PMC7493720/bmm-2020-0309.nxml"
+    try:
+        assert post(url, {"nxml_file": nxml_file}, content_type="text/plain")[0] == 415
+        assert post(url, {"pmc_id": "PMC7493720"})[0] == 400
+        # PMCIDs name the folder written to, so must not lead out of the corpus extract directory
+        assert post(url, {"nxml_file": nxml_file, "pmc_id": "../../etc", "write": True})[0] == 400
+        assert post(url, {"nxml_file": nxml_file, "pmc_id": "PMC1\n"})[0] == 400
+        # only NXML files under the corpus download directory are read
+        assert post(url, {"nxml_file": "tests/corpus-download/../../README.md", "pmc_id": "PMC1"})[0] == 403
+        assert post(url, {"nxml_file": os.path.abspath("README.md"), "pmc_id": "PMC1"})[0] == 403
+        assert post(url, {"nxml_file": "tests/corpus-download/PMC1/missing.nxml"})[0] == 404
+        assert os.listdir(str(tmp_path)) == []
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,83 @@
+""" Test deduplication of images in the content-addressed image store"""
+
+import os
+
+from corpusbuilder.helper import extract_tar_file
+from corpusbuilder.image_store import ImageStore
+
+
+def test_image_store(tmp_path):
+    image_store = ImageStore(str(tmp_path / "image-store"))
+
+    # same logo in two articles, plus a distinct figure
+    for pmc_id in ["PMC1", "PMC2"]:
+        os.makedirs(str(tmp_path / pmc_id))
+        (tmp_path / pmc_id / "logo.gif").write_bytes(b"GIF89a logo")
+    (tmp_path / "PMC2" / "figure1.jpg").write_bytes(b"JPEG figure")
+
+    blob_1 = image_store.add(str(tmp_path / "PMC1" / "logo.gif"))
+    blob_2 = image_store.add(str(tmp_path / "PMC2" / "logo.gif"))
+    blob_3 = image_store.add(str(tmp_path / "PMC2" / "figure1.jpg"))
+
+    assert blob_1 == blob_2
+    assert blob_1 != blob_3
+    assert blob_1.endswith(".gif")
+    assert os.path.samefile(blob_1, str(tmp_path / "PMC2" / "logo.gif"))
+    assert (tmp_path / "PMC2" / "logo.gif").read_bytes() == b"GIF89a logo"
+    assert image_store.num_files == 3
+    assert image_store.num_duplicates == 1
+    assert image_store.bytes_saved == len(b"GIF89a logo")
+
+    # adding an already linked file again is a no-op
+    assert image_store.add(str(tmp_path / "PMC2" / "logo.gif")) == blob_1
+    assert image_store.num_duplicates == 1
+
+
+def test_image_store_reextract(tmp_path, make_archive):
+    image_store = ImageStore(str(tmp_path / "image-store"))
+    download_dir = str(tmp_path / "corpus-download")
+    os.makedirs(download_dir)
+    for pmc_id in ["PMC1", "PMC2"]:
+        with open(os.path.join(download_dir, pmc_id + ".tar.gz"), 'wb') as file:
+            file.write(make_archive({pmc_id + "/logo.gif": b"LOGO-V1"}))
+        extract_tar_file(download_dir, os.path.join(download_dir, pmc_id + ".tar.gz"), image_store)
+    blob = image_store.get_blob_path(ImageStore.hash_file(os.path.join(download_dir, "PMC1", "logo.gif")), ".gif")
+    assert not os.access(blob, os.W_OK) or os.geteuid() == 0
+
+    # figures are pointed to the canonical copy without hashing or adding the image again
+    assert image_store.get_canonical_path(os.path.join(download_dir, "PMC2", "logo.gif")) == blob
+    assert image_store.num_files == 2
+
+    # re-extracting an updated archive replaces the article's file instead of writing through the link
+    with open(os.path.join(download_dir, "PMC1.tar.gz"), 'wb') as file:
+        file.write(make_archive({"PMC1/logo.gif": b"LOGO-V2-CHANGED"}))
+    extract_tar_file(download_dir, os.path.join(download_dir, "PMC1.tar.gz"), image_store)
+    with open(blob, 'rb') as file:
+        assert file.read() == b"LOGO-V1"
+    with open(os.path.join(download_dir, "PMC2", "logo.gif"), 'rb') as file:
+        assert file.read() == b"LOGO-V1"
+    with open(os.path.join(download_dir, "PMC1", "logo.gif"), 'rb') as file:
+        assert file.read() == b"LOGO-V2-CHANGED"
+
+
+def test_image_store_canonical_path(tmp_path, monkeypatch):
+    image_store = ImageStore(str(tmp_path / "image-store"))
+    for pmc_id in ["PMC1", "PMC2", "PMC3"]:
+        os.makedirs(str(tmp_path / pmc_id))
+    (tmp_path / "PMC1" / "logo.gif").write_bytes(b"GIF89a logo")
+    (tmp_path / "PMC2" / "figure1.jpg").write_bytes(b"JPEG figure")
+    assert image_store.get_canonical_path(str(tmp_path / "PMC2" / "figure1.jpg")) == str(tmp_path / "PMC2" / "figure1.jpg")
+
+    # images added after the first lookup are found by inode, without hashing them again
+    blob_1 = image_store.add(str(tmp_path / "PMC1" / "logo.gif"))
+    blob_2 = image_store.add(str(tmp_path / "PMC2" / "figure1.jpg"))
+    hashed = []
+    monkeypatch.setattr(ImageStore, "hash_file", staticmethod(lambda file_path: hashed.append(file_path)))
+    assert image_store.get_canonical_path(str(tmp_path / "PMC1" / "logo.gif")) == blob_1
+    assert image_store.get_canonical_path(str(tmp_path / "PMC2" / "figure1.jpg")) == blob_2
+    assert hashed == []
+    monkeypatch.undo()
+
+    # a copy (e.g. the store is on another device), or an image added by another process, is found by its hash
+    (tmp_path / "PMC3" / "logo.gif").write_bytes(b"GIF89a logo")
+    assert ImageStore(str(tmp_path / "image-store")).get_canonical_path(str(tmp_path / "PMC3" / "logo.gif")) == blob_1
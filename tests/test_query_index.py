@@ -0,0 +1,71 @@
+""" Test the query index over extracted JSON files"""
+
+import sqlite3
+
+import pytest
+
+from corpusbuilder.helper import write_json
+from corpusbuilder.query_index import QueryIndex
+
+
+def make_extract_json(pmc_id, journal, year, country, caption):
+    return {"pmc_id": pmc_id,
+            "metadata": {"article_title": "Title of " + pmc_id, "license": "CC BY",
+                         "provenance": {"authors": [{"given_names": "Anna", "surname": "Schmidt",
+                                                     "affiliations": [{"name": "", "location": "", "country": country}]}],
+                                        "publication_date": {"day": 1, "month": 2, "year": year},
+                                        "publisher": {"journal_name": journal}}},
+            "html_tables": [{"id": "Table 1", "table_caption": "<caption><title>" + caption + "</title></caption>"}],
+            "image_tables": [],
+            "figures": [{"id": "Figure 1", "caption": "<caption><p>Overview</p></caption>"}]}
+
+
+def test_query_index(tmp_path):
+    query_index = QueryIndex(str(tmp_path / "query-index.sqlite"))
+    articles = [make_extract_json("PMC1", "Vaccines", 2021, "Germany", "Antibody titer by age"),
+                make_extract_json("PMC2", "Vaccines", 2020, "Germany", "Patient characteristics"),
+                make_extract_json("PMC3", "PLoS ONE", 2021, "France", "Antibody response")]
+    for article in articles:
+        (tmp_path / article["pmc_id"]).mkdir()
+        write_json(str(tmp_path / article["pmc_id"]), article["pmc_id"], article)
+        query_index.add(article, str(tmp_path / article["pmc_id"]))
+
+    assert query_index.query() == ["PMC1", "PMC2", "PMC3"]
+    assert query_index.query(year=2021, country="germany", journal="vaccines") == ["PMC1"]
+    assert query_index.query(author="Schmidt", license="CC BY", year=2020) == ["PMC2"]
+    assert query_index.query(caption="antibody") == ["PMC1", "PMC3"]
+    records = query_index.query(country="France", records="tables")
+    assert records == [{"pmc_id": "PMC3", "kind": "html_table", "id": "Table 1", "caption": "Antibody response"}]
+    assert len(query_index.query(records="all")) == 6
+
+    # adding an article again replaces it
+    query_index.add(make_extract_json("PMC1", "Vaccines", 2021, "Italy", "Dosage"), str(tmp_path / "PMC1"))
+    assert query_index.query(country="Germany") == ["PMC2"]
+    assert query_index.query(caption="antibody") == ["PMC3"]
+
+    # rebuilding re-reads the JSON files written above
+    assert query_index.rebuild(str(tmp_path)) == 3
+    assert query_index.query(country="Germany") == ["PMC1", "PMC2"]
+    query_index.close()
+
+
+def test_query_index_caption_terms(tmp_path):
+    query_index = QueryIndex(str(tmp_path / "query-index.sqlite"))
+    articles = [make_extract_json("PMC1", "Vaccines", 2021, "Germany", "IL-6 levels in COVID-19 patients (p=0.05)"),
+                make_extract_json("PMC2", "Vaccines", 2021, "Germany", "Antibody titer in mice")]
+    for article in articles:
+        query_index.add(article, str(tmp_path))
+
+    # terms with FTS5 operators or punctuation are matched as plain words
+    assert query_index.query(caption="COVID-19") == ["PMC1"]
+    assert query_index.query(caption="IL-6 levels") == ["PMC1"]
+    assert query_index.query(caption="p<0.05") == (["PMC1"] if query_index.has_fts else [])
+    assert query_index.query(caption='"mice" AND') == []
+
+    # raw FTS5 syntax only with fts_syntax
+    if query_index.has_fts:
+        assert query_index.query(caption="antibody NOT mice", fts_syntax=True) == []
+        assert query_index.query(caption="antibody OR patients", fts_syntax=True) == ["PMC1", "PMC2"]
+        with pytest.raises(sqlite3.OperationalError):
+            query_index.query(caption="COVID-19", fts_syntax=True)
+    query_index.close()
@@ -0,0 +1,25 @@
+""" Test moving large table HTML and captions to sidecar files"""
+
+import json
+
+from corpusbuilder.sidecar import spill_large_fields, load_sidecar, is_sidecar_reference
+
+
+def test_spill_large_fields(tmp_path):
+    table_html = "<table>" + "<tr><td>1</td></tr>" * 100 + "</table>"
+    extract_json = {"pmc_id": "PMC1",
+                    "html_tables": [{"id": "Table 1", "table_html": table_html, "table_caption": "<caption>small</caption>"}],
+                    "image_tables": [],
+                    "figures": [{"id": "Figure 1", "caption": "<caption>small</caption>"}]}
+
+    assert spill_large_fields(extract_json, str(tmp_path), 1000) == 1
+    reference = extract_json["html_tables"][0]["table_html"]
+    assert is_sidecar_reference(reference)
+    assert reference["bytes"] == len(table_html)
+    assert (tmp_path / reference["sidecar"]).exists()
+    assert extract_json["html_tables"][0]["table_caption"] == "<caption>small</caption>"
+
+    # JSON stays serializable and the sidecar restores the original text
+    reference = json.loads(json.dumps(extract_json))["html_tables"][0]["table_html"]
+    assert load_sidecar(reference, str(tmp_path)) == table_html
+    assert load_sidecar("<caption>small</caption>", str(tmp_path)) == "<caption>small</caption>"
@@ -0,0 +1,14 @@
+""" Test that the command line modules import without pulling in heavy dependencies"""
+
+import subprocess
+import sys
+
+HEAVY_MODULES = ["spacy", "bs4", "requests", "geonamescache", "pycurl", "asyncio"]
+
+
+def test_import_is_lazy():
+    code = ("import sys\n"
+            "import corpusbuilder.corpus_builder, corpusbuilder.command_line, corpusbuilder.document_index\n"
+            "print(','.join(m for m in " + repr(HEAVY_MODULES) + " if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
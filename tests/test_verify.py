@@ -0,0 +1,97 @@
+""" Test archive verification, atomic JSON writes and the corpus verifier"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from corpusbuilder.config import Config
+from corpusbuilder.corpus_verifier import CorpusVerifier
+from corpusbuilder.helper import get_tar_file_error, read_pmcid_file, write_json, PARTIAL_FILE_SUFFIX
+
+
+def test_get_tar_file_error(tmp_path, make_archive):
+    tar_file_path = str(tmp_path / "PMC1.tar.gz")
+    with open(tar_file_path, 'wb') as file:
+        file.write(make_archive({"PMC1/article.nxml": os.urandom(50000)}))
+    assert get_tar_file_error(tar_file_path) == ""
+
+    # a truncated archive is caught
+    with open(tar_file_path, 'rb') as file:
+        data = file.read()
+    with open(tar_file_path, 'wb') as file:
+        file.write(data[:len(data) - 100])
+    assert get_tar_file_error(tar_file_path) != ""
+
+
+def test_write_json_is_atomic(tmp_path):
+    write_json(str(tmp_path), "PMC1", {"pmc_id": "PMC1"})
+    assert os.listdir(str(tmp_path)) == ["PMC1.json"]
+
+
+def test_corpus_verifier(tmp_path, make_archive):
+    config = Config("config.ini")
+    config.corpus_download_dir = str(tmp_path / "corpus-download") + "/"
+    config.corpus_extract_dir = str(tmp_path / "corpus-extract") + "/"
+    for pmc_id, nxml in [("PMC1", b"<article></article>\n"), ("PMC2", b"<article><body>")]:
+        os.makedirs(config.corpus_download_dir + pmc_id)
+        with open(config.corpus_download_dir + pmc_id + "/article.nxml", 'wb') as file:
+            file.write(nxml)
+        os.makedirs(config.corpus_extract_dir + pmc_id)
+    write_json(config.corpus_extract_dir + "PMC1", "PMC1", {"pmc_id": "PMC1", "html_tables": [], "image_tables": [], "figures": []})
+    with open(config.corpus_extract_dir + "PMC2/PMC2.json", 'w') as file:
+        file.write('{"pmc_id": "PMC2", "html_ta')
+    with open(config.corpus_download_dir + "PMC3.tar.gz" + PARTIAL_FILE_SUFFIX, 'wb') as file:
+        file.write(b"partial")
+    with open(config.corpus_download_dir + "PMC4.tar.gz", 'wb') as file:
+        file.write(make_archive({"PMC4/article.nxml": os.urandom(50000)}))
+
+    problems = CorpusVerifier(config, max_workers=2).verify()
+    assert sorted((kind, os.path.basename(path)) for kind, path, error in problems) == \
+        [("download", "PMC2"), ("extract", "PMC2"), ("partial", "PMC3.tar.gz.part")]
+    assert CorpusVerifier.get_pmc_ids(problems) == ["PMC2", "PMC3"]
+
+    CorpusVerifier.delete(problems)
+    assert CorpusVerifier(config, max_workers=2).verify() == []
+    assert not os.path.exists(config.corpus_download_dir + "PMC2")
+
+
+def run_script(script, *args):
+    subprocess.run([sys.executable, script] + list(args), check=False, capture_output=True)
+
+
+def test_rerun_after_delete(tmp_path):
+    # extract two articles, then damage one of the extracted JSON files
+    with open("config.ini", 'r') as file:
+        config_text = file.read()
+    config_text = config_text.replace("CorpusDownloadDir=corpus-download/", "CorpusDownloadDir=" + str(tmp_path / "corpus-download") + "/")
+    config_text = config_text.replace("CorpusExtractDir=corpus-extract/", "CorpusExtractDir=" + str(tmp_path / "corpus-extract") + "/")
+    config_text = config_text.replace("AffiliationNER=spacy", "AffiliationNER=rules")
+    (tmp_path / "config.ini").write_text(config_text)
+    config = Config(str(tmp_path / "config.ini"))
+    for pmc_id in ["PMC7493720", "PMC7826947"]:
+        shutil.copytree("tests/corpus-download/" + pmc_id, config.corpus_download_dir + pmc_id)
+    index_file = str(tmp_path / "index.csv")
+    with open(index_file, 'w') as file:
+        file.write("File,Article Citation,Accession ID,Last Updated (YYYY-MM-DD HH:MM:SS),PMID,License\n")
+        for pmc_id in ["PMC7493720", "PMC7826947"]:
+            file.write("oa_package/00/00/" + pmc_id + ".tar.gz,Citation," + pmc_id + ",2021-01-01 00:00:00,1,CC BY\n")
+    run_script("extract_corpus.py", "-c", str(tmp_path / "config.ini"), "-f", index_file)
+    json_1 = config.corpus_extract_dir + "PMC7493720/PMC7493720.json"
+    json_2 = config.corpus_extract_dir + "PMC7826947/PMC7826947.json"
+    with open(json_2, 'r') as file:
+        expected_json = json.load(file)
+    with open(json_2, 'w') as file:
+        file.write('{"pmc_id": "PMC7826947", "html_ta')
+    os.utime(json_1, (0, 0))
+
+    # verify --delete flags the damaged article, rerunning with its report only extracts that article again
+    run_script("verify_corpus.py", "-c", str(tmp_path / "config.ini"), "--workers", "2", "--delete")
+    assert read_pmcid_file(config.corpus_extract_dir + "verify-report.json") == ["PMC7826947"]
+    assert not os.path.exists(json_2)
+    run_script("extract_corpus.py", "-c", str(tmp_path / "config.ini"), "-f", index_file,
+               "--pmcid-file", config.corpus_extract_dir + "verify-report.json")
+    with open(json_2, 'r') as file:
+        assert json.load(file) == expected_json
+    assert os.path.getmtime(json_1) == 0
@@ -0,0 +1,44 @@
+""" Test sharding and the lease-based work queue used for distributed extraction"""
+
+import json
+
+from corpusbuilder.helper import get_shard, parse_shard, merge_run_reports, write_json
+from corpusbuilder.work_queue import WorkQueue
+
+
+def test_shard():
+    assert parse_shard("1/4") == (1, 4)
+    pmc_ids = ["PMC" + str(i) for i in range(100)]
+    shards = [[pmc_id for pmc_id in pmc_ids if get_shard(pmc_id, 4) == i] for i in range(4)]
+    assert sorted(sum(shards, [])) == sorted(pmc_ids)
+    assert all(len(shard) > 0 for shard in shards)
+    assert get_shard("PMC7493720", 4) == get_shard("PMC7493720", 4)
+
+
+def test_work_queue(tmp_path):
+    db_path = str(tmp_path / "queue.sqlite")
+    worker_1 = WorkQueue(db_path, lease_seconds=600, worker_id="worker-1")
+    worker_2 = WorkQueue(db_path, lease_seconds=-1, worker_id="worker-2")
+    worker_1.add(["PMC1", "PMC2"])
+    worker_2.add(["PMC2", "PMC3"])
+
+    assert worker_1.claim() == "PMC1"
+    assert worker_2.claim() == "PMC2"
+    worker_1.complete("PMC1")
+
+    # worker-2's lease has already expired, so its PMCID can be claimed again
+    assert worker_1.claim() == "PMC2"
+    assert worker_1.claim() == "PMC3"
+    worker_1.complete("PMC2")
+    worker_1.fail("PMC3")
+    assert worker_1.claim() is None
+    assert worker_1.get_counts() == {"done": 2, "failed": 1}
+
+
+def test_merge_run_reports(tmp_path):
+    write_json(str(tmp_path), "run-report-0-of-2", {"num_processed": 2, "num_failed": 0, "processed": ["PMC1", "PMC2"], "failed": []})
+    write_json(str(tmp_path), "run-report-1-of-2", {"num_processed": 1, "num_failed": 1, "processed": ["PMC3"], "failed": ["PMC4"]})
+    merged_report = merge_run_reports(str(tmp_path))
+    assert merged_report["num_processed"] == 3
+    assert merged_report["failed"] == ["PMC4"]
+    assert json.loads((tmp_path / "run-report.json").read_text())["processed"] == ["PMC1", "PMC2", "PMC3"]
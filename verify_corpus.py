@@ -0,0 +1,34 @@
+""" Script to check downloaded and extracted corpus documents for corrupt or incomplete items """
+
+import logging
+import sys
+
+from corpusbuilder.config import Config
+from corpusbuilder.command_line import CommandLineForVerify
+from corpusbuilder.corpus_verifier import CorpusVerifier
+from corpusbuilder.helper import *
+
+if __name__ == '__main__':
+
+    logging.basicConfig(level=logging.DEBUG)
+
+    # get items from command line
+    cmd_line = CommandLineForVerify()
+    config = Config(cmd_line.get_config_file())
+
+    # check partial files, archives and article folders in parallel
+    problems = CorpusVerifier(config, cmd_line.get_workers()).verify()
+    for kind, path, error in problems:
+        logging.warning(kind + ' ' + path + ': ' + error)
+
+    # write which articles need to be downloaded or extracted again
+    pmc_ids = CorpusVerifier.get_pmc_ids(problems)
+    create_dir(config.corpus_extract_dir)
+    write_json(config.corpus_extract_dir, 'verify-report',
+               {"num_problems": len(problems), "pmc_ids": pmc_ids,
+                "problems": [{"kind": kind, "path": path, "error": error} for kind, path, error in problems]})
+    logging.info('Found ' + str(len(problems)) + ' corrupt or incomplete items affecting ' + str(len(pmc_ids)) + ' articles')
+
+    if cmd_line.get_delete():
+        CorpusVerifier.delete(problems)
+    sys.exit(1 if problems and not cmd_line.get_delete() else 0)